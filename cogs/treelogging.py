@@ -3,22 +3,47 @@ import re
 import logging
 import asyncio
 from io import BytesIO
-from datetime import datetime, timedelta
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone, time as dt_time
+from zoneinfo import ZoneInfoNotFoundError
 # import 3rd party packages
-import pytz
+import numpy
+import pandas
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 # import utils & cogs
-from utils.constants import DATETIME_STRING_FORMAT, PATTERN_TIMESTAMP
+from utils.constants import (
+    DATETIME_STRING_FORMAT, PATTERN_TIMESTAMP, PATTERN_READY,
+    PATTERN_MENTION, PATTERN_GOAL, PATTERN_NEWLINE
+)
 from utils.tree_logs import TreeLogFile, TreeNextWater
 from utils.json import BotConfigFile
+from utils.timezone import get_timezone
+from utils.tree_embed import is_tree_embed
 from utils.treelogging_graph import util_graph_summary
-from utils.send_message import util_send_message_in_channel
+from utils.send_message import util_can_send_in_channel, util_send_message_in_channel
 
 # set up the logger
 logger = logging.getLogger(__name__)
 
+# the number of hours summarised by the "Past Year" status message
+HOURS_PER_YEAR = 24 * 365
+
+# status messages are only scheduled on the hour,
+# so only check them just after the start of every hour
+STATUS_MESSAGE_TIMES = [
+    dt_time(hour=hour, second=1, tzinfo=timezone.utc)
+    for hour in range(24)
+]
+
+@lru_cache(maxsize=256)
+def compile_goal_pattern(pattern: str) -> re.Pattern:
+    """
+    Compiles a goal pattern, reusing it for every guild with the same pattern.
+    """
+    return re.compile(pattern)
+
 # create a class for logging the tree watering
 class TreeLoggingCog(commands.Cog):
     """
@@ -38,6 +63,18 @@ class TreeLoggingCog(commands.Cog):
         self.next_water = next_water
         self.data_folder = "data"
 
+    async def cog_load(self):
+        """
+        Starts the status message loop once, when the cog is loaded
+        """
+        self.status_message.start()
+
+    async def cog_unload(self):
+        """
+        Stops the status message loop when the cog is unloaded
+        """
+        self.status_message.cancel()
+
     @commands.Cog.listener()
     async def on_raw_message_edit(self, payload):
         """
@@ -46,25 +83,14 @@ class TreeLoggingCog(commands.Cog):
         - the tree is watered
         - the buttons change
         """
-        try: # get the message from the payload
-            message = payload.message
-            # message doesn't exist
-            if message is None:
-                return
-        except AttributeError:
-            logger.warning("Payload has no message attached.")
-            return
-        except Exception as e: # pylint: disable=broad-exception-caught
-            logger.warning(f"Unknown error when fetching message edit.\n{e}")
+        # get the message from the payload, skip if it doesn't exist
+        message = getattr(payload, "message", None)
+        if message is None:
             return
 
         # check the status of the tree, if it is a tree
         await self.check_tree(message=message)
 
-        # restart the status message loop, if it is not running
-        if not self.status_message.is_running():
-            self.status_message.start()
-
     async def check_tree(
         self,
         message: discord.Message
@@ -73,42 +99,51 @@ class TreeLoggingCog(commands.Cog):
         Checks whether the message is from "Grow a Tree",
         Calls log_tree and check_goal if it is. 
         """
-        try: # get the edited_at timestamp from the message
-            edited_at = message.edited_at
-            # edited at doesn't exist somehow
-            if edited_at is None:
-                return
-        except AttributeError:
-            logger.warning("Message has no edited_at attribute.")
-            return
-        except Exception as e: # pylint: disable=broad-exception-caught
-            logger.warning(f"Unknown error when fetching edited_at.\n{e}")
+        # skip messages without embeds, outside of guilds, or not from a bot before anything else
+        if not message.embeds or message.guild is None or not message.author.bot:
             return
 
         # fetch the general config
-        config = await self.config.get_data(message.guild.id, "general")
+        config = self.config.view_data(message.guild.id, "general")
         # skip if the config is not set up correctly
-        if config["channel_id"] is None or config["tree_name"] is None:
+        if config is None or config["channel_id"] is None or config["tree_name"] is None:
+            return
+        # skip if it is not in the correct channel
+        if message.channel.id != config["channel_id"]:
             return
-        # in the correct channel and with embeds
-        if message.channel.id == config["channel_id"] and message.embeds:
-            for embed in message.embeds:
-                if (
-                    hasattr(embed, "title") and 
-                    embed.title is not None and
-                    config["tree_name"] in embed.title and
-                    hasattr(embed, "description") and
-                    embed.description is not None and
-                    "your tree is" in embed.description.lower()
-                ):
-                    embed_text = f"{embed.description}\n{embed.footer.text}"
-                    await self.log_tree(guild_id=message.guild.id, embed_text=embed_text, edited_at=edited_at)
-                    await self.check_goal(guild_id=message.guild.id, embed_text=embed_text)
+
+        # get the edited_at timestamp from the message, skip if it doesn't exist
+        edited_at = getattr(message, "edited_at", None)
+        if edited_at is None:
+            return
+
+        # look for the first tree embed
+        tree_name = config["tree_name"]
+        embed = next(
+            (embed for embed in message.embeds if is_tree_embed(embed, tree_name)),
+            None
+        )
+        if embed is None:
+            return
+        description = embed.description
+        footer_text = embed.footer.text or ""
+        await self.log_tree(
+            guild_id=message.guild.id,
+            description=description,
+            footer_text=footer_text,
+            edited_at=edited_at
+        )
+        await self.check_goal(
+            guild_id=message.guild.id,
+            description=description,
+            footer_text=footer_text
+        )
 
     async def log_tree(
         self,
         guild_id: int,
-        embed_text: str,
+        description: str,
+        footer_text: str,
         edited_at: datetime
     ) -> None:
         """
@@ -117,16 +152,25 @@ class TreeLoggingCog(commands.Cog):
         - when the tree can be watered next
         """
         # usually only the message displaying the tree will contain "ready to be watered"
-        if not "ready to be watered" in embed_text.lower():
+        if not (PATTERN_READY.search(description) or PATTERN_READY.search(footer_text)):
             # look for the timestamp of when it can be watered next
-            timestamp = PATTERN_TIMESTAMP.search(embed_text)
+            # (skip the regex on text without a timestamp)
+            timestamp = None
+            for text in (description, footer_text):
+                if "<t:" in text:
+                    timestamp = PATTERN_TIMESTAMP.search(text)
+                    if timestamp is not None:
+                        break
             # timestamp was not found
             if timestamp is None:
-                logger.info("Could not find timestamp <t:12345678:R> in embed text " + embed_text.replace("\n", ""))
+                logger.info(
+                    "Could not find timestamp <t:12345678:R> in embed text "
+                    + description.replace("\n", "") + footer_text.replace("\n", "")
+                )
                 return
             # timestamp was found
-            timestamp = int(timestamp.group())
-            timestamp = datetime.fromtimestamp(timestamp=timestamp, tz=pytz.utc)
+            timestamp = int(timestamp.group(1))
+            timestamp = datetime.fromtimestamp(timestamp=timestamp, tz=timezone.utc)
             # fetch the next water time
             next_water, water_duration = await self.next_water.fetch_guild(guild_id=guild_id)
             # skip logging if it is before edited_at or next_water
@@ -157,22 +201,24 @@ class TreeLoggingCog(commands.Cog):
     async def check_goal(
         self,
         guild_id: int,
-        embed_text: str
+        description: str,
+        footer_text: str
     ) -> None:
         """
         Checks whether the goal has been reached,
         and sends a notification if it has.
         """
         # fetch the goal config
-        config = await self.config.get_data(guild_id, "tree_goal")
+        config = self.config.view_data(guild_id, "tree_goal")
         # ignore if no channel_id has been set
-        if config["channel_id"] is None:
+        if config is None or config["channel_id"] is None:
             return
         # check whether the goal has been reached
         if config["reached"]:
             return
         # look for the pattern in the embed text
-        value = re.search(config["pattern"], embed_text)
+        embed_text = f"{description}\n{footer_text}"
+        value = compile_goal_pattern(config["pattern"]).search(embed_text)
         if value is None:
             # logger.info(f"Could not find pattern: {config['pattern']} in embed text {embed_text}")
             return
@@ -185,12 +231,9 @@ class TreeLoggingCog(commands.Cog):
         ):
             # create the notification message
             content = config["message"]
-            def substitute_string(match):
-                user_or_role_id = re.search(r"&?[0-9]+", match.group()).group()
-                return f"<@{user_or_role_id}>"
-            content = re.sub(r"`@/[0-9]+`", substitute_string, content)
-            content = re.sub(r"(?i)(?<=`)goal(?=`)", f"{config['goal']}", content)
-            content = re.sub(r"(?i) ?`newline` ?", "\n", content)
+            content = PATTERN_MENTION.sub(r"<@\1>", content)
+            content = PATTERN_GOAL.sub(f"{config['goal']}", content)
+            content = PATTERN_NEWLINE.sub("\n", content)
             # send the notification message
             message = await util_send_message_in_channel(
                 bot=self.bot,
@@ -199,139 +242,224 @@ class TreeLoggingCog(commands.Cog):
             )
             if message is not None:
                 # update "reached" to True
+                config = dict(config)
                 config["reached"] = True
                 # save the config
                 config = await self.config.set_data(guild_id, "tree_goal", config)
 
-    async def calc_up_down(
+    async def calc_up_down_windows(
         self,
         guild_id: int,
-        hours: int
-    ) -> tuple:
+        windows: list[int]
+    ) -> list[tuple]:
         """
-        Returns a tuple containing (uptime, downtime) within the past x hours.
+        Returns a list of tuples containing (uptime, downtime) within the past x hours,
+        for every x in windows. The logs are only read once, for the longest window.
+        (overlapping logs are removed across the longest window, so a shorter window
+        can differ slightly from reading its own logs when the logs overlap)
         """
-        # get current time and find the cutoff
-        now = datetime.now(tz=pytz.utc)
-        cutoff = now - timedelta(hours=hours)
+        # get current time and find the earliest cutoff
+        now = discord.utils.utcnow()
+        earliest = now - timedelta(hours=max(windows))
 
         # fetch the logs
         df = await self.tree_logs.read_log(
             guild_id=guild_id,
-            start=cutoff,
+            start=earliest,
             end=now
         )
 
+        # no logs to calculate from
+        if df is None or df.empty:
+            return [(0, hours * 60 * 60) for hours in windows]
+
+        # fetch the maximum duration before it is counted as an outlier
+        # (without a config, there is nothing to calculate the windows with)
+        config = self.config.view_data(guild_id, "general")
+        if config is None:
+            return [(0, hours * 60 * 60) for hours in windows]
+        max_duration = config["outlier_duration"]
+
+        # calculate each window from the same logs, in a worker thread
+        return await asyncio.to_thread(
+            lambda df=df: [
+                self.up_down_from_logs(
+                    df=df,
+                    cutoff=now - timedelta(hours=hours),
+                    now=now,
+                    max_duration=max_duration
+                )
+                for hours in windows
+            ]
+        )
+
+    @staticmethod
+    def up_down_from_logs(
+        df: pandas.DataFrame,
+        cutoff: datetime,
+        now: datetime,
+        max_duration: float
+    ) -> tuple:
+        """
+        Returns a tuple containing (uptime, downtime) between cutoff and now,
+        from the logs of a single type returned by read_log.
+        """
+        # only use the logs which end after the cutoff
+        # (after removing overlaps, the logs are sorted by end,
+        # so they are the slice after a binary search)
+        cutoff64 = pandas.Timestamp(cutoff).to_datetime64()
+        now64 = pandas.Timestamp(now).to_datetime64()
+        end = df['end'].values
+        first = numpy.searchsorted(end, cutoff64, side="left")
+        one_second = numpy.timedelta64(1, 's')
+
         # clamp values
-        df.loc[df['start'] <= cutoff, 'start'] = cutoff
-        df.loc[df['end']   >= now,    'end']   = now
+        start = numpy.maximum(df['start'].values[first:], cutoff64)
+        end   = numpy.minimum(end[first:], now64)
 
-        # calculate uptime and downtime
-        df['uptime']   = df['end'] - df['start']
-        df['downtime'] = df['start'] - df['end'].shift(1)
-        df['uptime']    = df['uptime'].dt.total_seconds()
-        df['downtime']  = df['downtime'].dt.total_seconds()
+        # calculate uptime and downtime in seconds
+        # the first row has no previous end, so its downtime is unknown and it is skipped
+        uptime   = (end[1:] - start[1:]) / one_second
+        downtime = (start[1:] - end[:-1]) / one_second
 
         # remove outliers
-        config = await self.config.get_data(guild_id, "general")
-        max_duration = config["outlier_duration"]
-        df = df[(df['downtime'] < max_duration) & (df['uptime'] < max_duration)]
+        valid = (downtime < max_duration) & (uptime < max_duration)
+
+        # no datapoints within the valid range
+        if not valid.any():
+            return (0, float((now64 - cutoff64) / one_second))
 
         # get the sum of uptime and downtime
-        uptime   = df['uptime'].sum()
-        downtime = df['downtime'].sum()
+        uptime   = float(uptime[valid].sum())
+        downtime = float(downtime[valid].sum())
 
-        # no datapoints in the dataframe
-        if df.empty:
-            return (0, hours * 60 * 60)
-        else: # last datapoint ends before current time
-            last_dry = df['end'].iloc[-1]
-            if last_dry < now:
-                downtime += (now - last_dry).total_seconds()
+        # last datapoint ends before current time
+        last_dry = end[1:][valid][-1]
+        if last_dry < now64:
+            downtime += float((now64 - last_dry) / one_second)
 
         # return as a tuple
         return (uptime, downtime)
 
-    @tasks.loop(minutes=1)
+    @tasks.loop(time=STATUS_MESSAGE_TIMES)
     async def status_message(self):
         """
         Sends a status message summarising the uptime and downtime.
         """
         # fetch the current time with hour precision
-        dt = datetime.now(tz=pytz.utc)
+        dt = discord.utils.utcnow()
         # iterate through guild IDs
         guild_ids = [guild.id for guild in self.bot.guilds]
         for guild_id in guild_ids:
-            # fetch the status message config
+            # an error in one guild should not stop the loop for every guild
+            try:
+                await self.send_status_message(guild_id=guild_id, dt=dt)
+            except Exception: # pylint: disable=broad-exception-caught
+                logger.exception(f"Failed to send the status message in guild: {guild_id}.")
+
+    @status_message.before_loop
+    async def before_status_message(self):
+        """
+        Waits until the bot can send messages before sending status messages.
+        """
+        await self.bot.wait_until_ready()
+
+    async def send_status_message(self, guild_id: int, dt: datetime):
+        """
+        Sends a guild's status message, if one is due.
+        """
+        # check whether a message should be sent
+        config = self.config.view_data(guild_id, "status_message")
+        if (
+            config is not None and
+            config["channel_id"] is not None and
+            dt.weekday() in config["valid_days"]
+        ):
+            # fetch a copy of the status message config
             config = await self.config.get_data(guild_id, "status_message")
-            # check whether a message should be sent
-            if (
-                config["channel_id"] is not None and
-                dt.weekday() in config["valid_days"]
-            ):
-                for i, hour in enumerate(config["valid_hours"]):
-                    # doesn't exist yet
-                    if i >= len(config["next_message"]):
-                        # set the hour
+            if config is None:
+                return
+            # the copy is shallow, so copy next_message as well,
+            # the shared config is only changed by set_data
+            config["next_message"] = list(config["next_message"])
+            # only save the config once, if it has changed
+            dirty = False
+            # remove unused next_message
+            if len(config["next_message"]) > len(config["valid_hours"]):
+                del config["next_message"][len(config["valid_hours"]):]
+                dirty = True
+            for i, hour in enumerate(config["valid_hours"]):
+                # doesn't exist yet
+                if i >= len(config["next_message"]):
+                    # set the hour
+                    next_message = dt.replace(hour=hour, minute=0, second=0, microsecond=0)
+                    # if it is before today
+                    if next_message < dt:
+                        # shift to the next day
+                        next_message = next_message + timedelta(days=1)
+                    # shift until the next valid day
+                    while next_message.weekday() not in config["valid_days"]:
+                        next_message = next_message + timedelta(days=1)
+                    # add to next_message
+                    config["next_message"].append(int(next_message.timestamp()))
+                    dirty = True
+                # check the config
+                next_message = config["next_message"][i]
+                # convert times saved as strings by older versions to timestamps
+                if isinstance(next_message, str):
+                    next_message = datetime.fromisoformat(next_message)
+                    next_message = int(next_message.replace(tzinfo=timezone.utc).timestamp())
+                    config["next_message"][i] = next_message
+                    dirty = True
+                if dt.timestamp() > next_message:
+                    # skip the calculations if the message can't be sent
+                    if not await util_can_send_in_channel(
+                        bot=self.bot,
+                        channel_id=config["channel_id"]
+                    ):
+                        break
+                    # find the uptime and downtime
+                    (h_uptime, h_downtime), (y_uptime, y_downtime) = await self.calc_up_down_windows(
+                        guild_id=guild_id,
+                        windows=[config["total_hours"], HOURS_PER_YEAR]
+                    )
+                    # calculate the number of days and hours
+                    days = config['total_hours'] // 24
+                    hours = config['total_hours'] % 24
+                    time_delta_str = f"{days} days"
+                    if hours:
+                        time_delta_str += f", {hours} hours"
+                    # try to send the message
+                    message = await util_send_message_in_channel(
+                        bot=self.bot,
+                        channel_id=config["channel_id"],
+                        content=(
+                            f"### Past {time_delta_str}:\n"
+                            f"`uptime:` `{100 * h_uptime / (h_uptime + h_downtime + 0.00001):7.4f}%`   "
+                            f"`wet:` `{h_uptime:6.0f}`   `dry:` `{h_downtime:6.0f}`\n"
+                            f"### Past Year:\n"
+                            f"`uptime:` `{100 * y_uptime / (y_uptime + y_downtime + 0.00001):7.4f}%`   "
+                            f"`wet:` `{y_uptime:6.0f}`   `dry:` `{y_downtime:6.0f}`\n"
+                        )
+                    )
+                    if message is not None:
+                        # update the time for the next message
                         next_message = dt.replace(hour=hour, minute=0, second=0, microsecond=0)
-                        # if it is before today
-                        if next_message < dt:
+                        # if it has already passed
+                        if next_message <= dt:
                             # shift to the next day
                             next_message = next_message + timedelta(days=1)
                         # shift until the next valid day
                         while next_message.weekday() not in config["valid_days"]:
                             next_message = next_message + timedelta(days=1)
-                        # add to next_message
-                        config["next_message"].append(next_message.strftime(DATETIME_STRING_FORMAT))
-                        await self.config.set_data(guild_id, "status_message", config)
-                    # remove unused next_message
-                    if len(config["next_message"]) > len(config["valid_hours"]):
-                        config["next_message"] = config["next_message"][:len(config["valid_hours"])]
-                        await self.config.set_data(guild_id, "status_message", config)
-                    # check the config
-                    next_message = config["next_message"][i]
-                    next_message = datetime.strptime(next_message, DATETIME_STRING_FORMAT)
-                    next_message = next_message.replace(tzinfo=pytz.utc)
-                    if dt > next_message:
-                        # find the uptime and downtime
-                        h_uptime, h_downtime = await self.calc_up_down(
-                            guild_id=guild_id,
-                            hours=config["total_hours"]
-                        )
-                        y_uptime, y_downtime = await self.calc_up_down(
-                            guild_id=guild_id,
-                            hours=24*365
-                        )
-                        # calculate the number of days and hours
-                        days = config['total_hours'] // 24
-                        hours = config['total_hours'] % 24
-                        time_delta_str = f"{days} days"
-                        if hours:
-                            time_delta_str += f", {hours} hours"
-                        # try to send the message
-                        message = await util_send_message_in_channel(
-                            bot=self.bot,
-                            channel_id=config["channel_id"],
-                            content=(
-                                f"### Past {time_delta_str}:\n"
-                                f"`uptime:` `{100 * h_uptime / (h_uptime + h_downtime + 0.00001):7.4f}%`   "
-                                f"`wet:` `{h_uptime:6.0f}`   `dry:` `{h_downtime:6.0f}`\n"
-                                f"### Past Year:\n"
-                                f"`uptime:` `{100 * y_uptime / (y_uptime + y_downtime + 0.00001):7.4f}%`   "
-                                f"`wet:` `{y_uptime:6.0f}`   `dry:` `{y_downtime:6.0f}`\n"
-                            )
-                        )
-                        if message is not None:
-                            # update the time for the next message
-                            next_message = dt.replace(hour=hour, minute=0, second=0, microsecond=0)
-                            # shift until the next valid day
-                            while next_message.weekday() not in config["valid_days"]:
-                                next_message = next_message + timedelta(days=1)
-                            # set the new time
-                            config["next_message"][i] = next_message.strftime(DATETIME_STRING_FORMAT)
-                            await self.config.set_data(guild_id, "status_message", config)
-                            # only send one message per server every time the loop runs
-                            break
+                        # set the new time
+                        config["next_message"][i] = int(next_message.timestamp())
+                        dirty = True
+                        # only send one message per server every time the loop runs
+                        break
+            # save the updated times
+            if dirty:
+                await self.config.set_data(guild_id, "status_message", config)
 
     @app_commands.command(
         name="watering_logs",
@@ -360,7 +488,7 @@ class TreeLoggingCog(commands.Cog):
         # set the guild id
         guild_id = interaction.guild_id
         # get the time period
-        now = datetime.now(tz=pytz.utc)
+        now = discord.utils.utcnow()
         end = now - timedelta(days=offset_days, hours=offset_hours)
         start = end - timedelta(days=days, hours=hours)
         # fetch the logs within the time period
@@ -380,10 +508,18 @@ class TreeLoggingCog(commands.Cog):
             )
             return
         # fetch the output timezone
-        config = await self.config.get_data(guild_id, "general")
+        config = self.config.view_data(guild_id, "general")
+        if config is None:
+            await interaction.followup.send(
+                content=(
+                    "The general config is not set up.\n"
+                    "Please set it up with `/config_general` and try again."
+                )
+            )
+            return
         try:
-            output_timezone = pytz.timezone(config["timezone"])
-        except pytz.exceptions.UnknownTimeZoneError:
+            output_timezone = get_timezone(config["timezone"])
+        except ZoneInfoNotFoundError:
             await interaction.followup.send(
                 content=(
                     "Invalid timezone. Please change the timezone in general config\n"
@@ -393,20 +529,16 @@ class TreeLoggingCog(commands.Cog):
             )
             return
         # convert timezones
-        df[['start', 'end']] = df[['start', 'end']].apply(
-            lambda col: col.dt.tz_convert(output_timezone)
-        )
-        # convert datetime into string
-        df[['start', 'end']] = df[['start', 'end']].apply(
-            lambda col: col.dt.strftime(DATETIME_STRING_FORMAT)
-        )
+        df['start'] = df['start'].dt.tz_convert(output_timezone)
+        df['end'] = df['end'].dt.tz_convert(output_timezone)
         # create a BytesIO object to store the logs in memory
+        # (the datetimes are formatted while the csv is written)
         buffer = BytesIO()
         await asyncio.to_thread(
-            lambda file=buffer, df=df: df.to_csv(
-                file, index=False,
-                encoding="utf-8"
-            )
+            df.to_csv,
+            buffer, index=False,
+            encoding="utf-8", lineterminator="\n",
+            date_format=DATETIME_STRING_FORMAT
         )
         # convert into a discord file
         buffer.seek(0)
@@ -457,7 +589,7 @@ class TreeLoggingCog(commands.Cog):
         # set the guild id
         guild_id = interaction.guild_id
         # get the time period
-        now = datetime.now(tz=pytz.utc)
+        now = discord.utils.utcnow()
         end = now - timedelta(days=offset_days, hours=offset_hours)
         start = end - timedelta(days=days, hours=hours)
         # fetch the logs within the time period
@@ -467,7 +599,7 @@ class TreeLoggingCog(commands.Cog):
             end=end
         )
         # error if there are no logs
-        if df.empty:
+        if df is None or df.empty:
             await interaction.followup.send(
                 content=(
                     "The requested logs contain no data.\n"
@@ -476,16 +608,25 @@ class TreeLoggingCog(commands.Cog):
             )
             return
         # generate the graph
-        config = await self.config.get_data(guild_id, "general")
+        config = self.config.view_data(guild_id, "general")
+        if config is None:
+            await interaction.followup.send(
+                content=(
+                    "The general config is not set up.\n"
+                    "Please set it up with `/config_general` and try again."
+                )
+            )
+            return
         try:
-            output_timezone = pytz.timezone(config["timezone"])
-        except pytz.exceptions.UnknownTimeZoneError:
+            output_timezone = get_timezone(config["timezone"])
+        except ZoneInfoNotFoundError:
             await interaction.followup.send(
                 content=(
                     "Invalid timezone. Please change the timezone in general config\n"
                     "Example configuration: `/config_general timezone:UTC` `/config_general timezone:Australia/Sydney`"
                 )
             )
+            return
         buffer = await util_graph_summary(
             df=df,
             max_duration=config["outlier_duration"],
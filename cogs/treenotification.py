@@ -1,22 +1,51 @@
 # import built-in packages
-import re
 import logging
 import asyncio
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 # import 3rd party packages
-import pytz
 import discord
 from discord.ext import commands, tasks
 # import utils & cogs
-from utils.constants import DATETIME_STRING_FORMAT
+from utils.constants import (
+    DATETIME_STRING_FORMAT, PATTERN_NEWLINE, PATTERN_PING, PATTERN_NOTIFICATION_MESSAGES
+)
 from utils.tree_logs import TreeLogFile, TreeNextWater
 from utils.json import BotConfigFile
-from utils.send_message import util_fetch_channel, util_send_message_in_channel, DummyMessage
-from utils.treenotification_emojis import button_emojis_from_message
+from utils.tree_embed import is_tree_embed
+from utils.send_message import (
+    util_fetch_channel, util_send_message_in_channel, forget_send_permission, DummyMessage
+)
+from utils.treenotification_emojis import button_emojis_from_message, EMOJI_BITS
 
 # set up the logger
 logger = logging.getLogger(__name__)
 
+# the longest time (seconds) to wait before checking the watering notifications again
+MAX_WATER_WAIT = 60
+
+# discord only bulk deletes messages newer than this
+BULK_DELETE_MAX_AGE = timedelta(days=14)
+
+# the most guilds to clean up at the same time
+MAX_CLEANUP_CONCURRENCY = 8
+
+# which part of the notification message is used for each category
+NOTIFICATION_INDEX = {
+    "insect": 0,
+    "fruit": 1,
+    "water": 2
+}
+
+@dataclass(slots=True)
+class GuildNotifications:
+    """
+    the notification message sent for each category, or None if there is none
+    """
+    insect: discord.Message | DummyMessage | None = None
+    fruit: discord.Message | DummyMessage | None = None
+    water: discord.Message | DummyMessage | None = None
+
 # create a class for logging the tree watering
 class TreeNotifCog(commands.Cog):
     """
@@ -31,12 +60,27 @@ class TreeNotifCog(commands.Cog):
     ):
         self.bot = bot
         self.config = config
-        self.message_mutex = asyncio.Lock()
 
         self.data_folder = "data"
         self.tree_logs = tree_logs
         self.next_water = next_water
-        self.notifications = {}
+        self.notifications: dict[int, GuildNotifications] = {}
+        self.channels: dict[int, discord.abc.Messageable] = {}
+        self.cleanup_semaphore = asyncio.Semaphore(MAX_CLEANUP_CONCURRENCY)
+
+    async def cog_load(self):
+        """
+        Starts the notification and cleanup loops once, when the cog is loaded
+        """
+        self.process_water_notification.start()
+        self.remove_notifications.start()
+
+    async def cog_unload(self):
+        """
+        Stops the notification and cleanup loops when the cog is unloaded
+        """
+        self.process_water_notification.cancel()
+        self.remove_notifications.cancel()
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -56,6 +100,32 @@ class TreeNotifCog(commands.Cog):
         # set an initial value for the next water
         await self.load_guild_notifications([guild.id])
 
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        """
+        Runs whenever a guild is left
+        """
+        # stop checking the notifications for the guild
+        self.notifications.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        """
+        Runs whenever a channel is deleted
+        """
+        # forget the cached channel and permissions
+        self.channels.pop(channel.id, None)
+        forget_send_permission(channel.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        """
+        Runs whenever a channel is updated
+        """
+        # forget the cached channel and permissions, they are fetched again when needed
+        self.channels.pop(before.id, None)
+        forget_send_permission(before.id)
+
     @commands.Cog.listener()
     async def on_raw_message_edit(self, payload):
         """
@@ -64,75 +134,48 @@ class TreeNotifCog(commands.Cog):
         - the tree is watered
         - the buttons change
         """
-        try: # get the message from the payload
-            message = payload.message
-            # message doesn't exist
-            if message is None:
-                return
-        except AttributeError:
-            logger.warning("Payload has no message attached.")
-            return
-        except Exception as e: # pylint: disable=broad-exception-caught
-            logger.warning(f"Unknown error when fetching message edit.\n{e}")
+        # get the message from the payload, skip if it doesn't exist
+        message = getattr(payload, "message", None)
+        if message is None:
             return
 
         # check the status of the tree, if it is a tree
         await self.check_tree(message=message)
 
-        # restart the notification loop, if it is not running
-        if not self.process_water_notification.is_running():
-            self.process_water_notification.start()
-        # restart the cleanup loop, if it is not running
-        if not self.remove_notifications.is_running():
-            self.remove_notifications.start()
-
     async def load_guild_notifications(self, guild_ids: list[int]):
         """
         Assuming no messages have been sent yet, set the notification message ID to None
         """
         for guild_id in guild_ids:
-            self.notifications.setdefault(
-                str(guild_id),
-                {
-                    "insect": None,
-                    "fruit": None,
-                    "water": None
-                }
-            )
+            if guild_id not in self.notifications:
+                self.notifications[guild_id] = GuildNotifications()
 
     async def check_tree(self, message: discord.Message):
         """
         Check if the message is a tree!
         """
-        try: # get the edited_at timestamp from the message
-            edited_at = message.edited_at
-            # edited at doesn't exist somehow
-            if edited_at is None:
-                return
-        except AttributeError:
-            logger.warning("Message has no edited_at attribute.")
-            return
-        except Exception as e: # pylint: disable=broad-exception-caught
-            logger.warning(f"Unknown error when fetching edited_at.\n{e}")
+        # skip messages without embeds, outside of guilds, or not from a bot before anything else
+        if not message.embeds or message.guild is None or not message.author.bot:
             return
 
         # fetch the general config
-        config = await self.config.get_data(message.guild.id, "general")
+        config = self.config.view_data(message.guild.id, "general")
         # skip if the config is not set up correctly
-        if config["channel_id"] is None or config["tree_name"] is None:
+        if config is None or config["channel_id"] is None or config["tree_name"] is None:
+            return
+        # skip if it is not in the correct channel
+        if message.channel.id != config["channel_id"]:
             return
-        # in the correct channel and with embeds
-        if message.channel.id == config["channel_id"] and message.embeds:
-            for embed in message.embeds:
-                if (
-                    hasattr(embed, "title") and 
-                    embed.title is not None and
-                    config["tree_name"] in embed.title and
-                    hasattr(embed, "description") and
-                    embed.description is not None and
-                    "your tree is" in embed.description.lower()
-                ):
-                    await self.process_button_notification(message=message)
+
+        # get the edited_at timestamp from the message, skip if it doesn't exist
+        edited_at = getattr(message, "edited_at", None)
+        if edited_at is None:
+            return
+
+        # the buttons only need to be checked once per message, if it has a tree embed
+        tree_name = config["tree_name"]
+        if any(is_tree_embed(embed, tree_name) for embed in message.embeds):
+            await self.process_button_notification(message=message)
 
     async def process_button_notification(self, message: discord.Message):
         """
@@ -140,49 +183,97 @@ class TreeNotifCog(commands.Cog):
         """
         # fetch the guild id
         guild_id = message.guild.id
-        if guild_id is None:
+        if guild_id is None or guild_id not in self.notifications:
             return
         # fetch the buttons
         buttons = await button_emojis_from_message(message=message)
         # fetch the notification config
-        config = await self.config.get_data(guild_id, "notification")
+        config = self.config.view_data(guild_id, "notification")
         # skip if channel_id is not configured
-        if config["channel_id"] is None:
+        if config is None or config["channel_id"] is None:
             return
-        # check if should send an insect notification
-        await self.process_notification(
-            config=config,
-            guild_id=guild_id,
-            category="insect",
-            state=self.tree_has_insect(buttons=buttons, guild_id=guild_id)
-        )
-        await self.process_notification(
-            config=config,
-            guild_id=guild_id,
-            category="fruit",
-            state=self.tree_has_basket(buttons=buttons)
+        # check if should send an insect or fruit notification
+        # (they are independent, so they are processed at the same time)
+        await asyncio.gather(
+            self.process_notification(
+                config=config,
+                guild_id=guild_id,
+                category="insect",
+                state=self.tree_has_insect(buttons=buttons, guild_id=guild_id)
+            ),
+            self.process_notification(
+                config=config,
+                guild_id=guild_id,
+                category="fruit",
+                state=self.tree_has_basket(buttons=buttons)
+            )
         )
 
-    @tasks.loop(seconds=1)
+    @tasks.loop(seconds=0)
     async def process_water_notification(self):
         """
-        sends a notification for watering
-        """
-        # iterate through guild IDs
-        guild_ids = [guild.id for guild in self.bot.guilds]
-        for guild_id in guild_ids:
+        sends a notification for watering,
+        then waits until a tree needs watering or next_water changes
+        """
+        # any change to next_water from now on will wake up the wait below
+        self.next_water.changed.clear()
+        started = datetime.now(timezone.utc)
+        # fetch every guild's next_water at once
+        # (the guilds with loaded notifications are the guilds the bot is in)
+        next_waters = await self.next_water.fetch_guilds(guild_ids=self.notifications)
+        for guild_id, (next_water, _) in next_waters.items():
+            # skip guilds which were left while checking the others
+            if guild_id not in self.notifications:
+                continue
             # fetch the notification config
-            config = await self.config.get_data(guild_id, "notification")
+            config = self.config.view_data(guild_id, "notification")
             # skip if channel_id is not configured
-            if config["channel_id"] is None:
+            if config is None or config["channel_id"] is None:
                 continue
             # check if should send a watering notification
-            await self.process_notification(
-                config=config,
-                guild_id=guild_id,
-                category="water",
-                state=(await self.tree_needs_watering(guild_id=guild_id))
-            )
+            # (an error in one guild should not stop the loop for every guild)
+            try:
+                await self.process_notification(
+                    config=config,
+                    guild_id=guild_id,
+                    category="water",
+                    state=self.tree_needs_watering(
+                        next_water=next_water,
+                        now=started
+                    )
+                )
+            except Exception: # pylint: disable=broad-exception-caught
+                logger.exception(f"Failed to process the water notification in guild: {guild_id}.")
+        # wait until the next tree needs watering
+        await self.wait_for_next_water(next_waters=next_waters, started=started)
+
+    @process_water_notification.before_loop
+    async def before_process_water_notification(self):
+        """
+        waits until the bot can send messages before checking the notifications
+        """
+        await self.bot.wait_until_ready()
+
+    async def wait_for_next_water(
+        self,
+        next_waters: dict[int, tuple[datetime, timedelta]],
+        started: datetime
+    ):
+        """
+        waits until the earliest next_water after the notifications were checked,
+        or until next_water changes, whichever is first
+        """
+        # find the time until the earliest next_water which was not checked
+        now = datetime.now(timezone.utc)
+        delay = MAX_WATER_WAIT
+        for next_water, _ in next_waters.values():
+            if next_water > started:
+                delay = min(delay, max(0, (next_water - now).total_seconds()))
+        # sleep until then, unless it is woken up
+        try:
+            await asyncio.wait_for(self.next_water.changed.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
 
     async def process_notification(
         self,
@@ -211,7 +302,10 @@ class TreeNotifCog(commands.Cog):
                     guild_id=guild_id,
                     category=category
                 )
-            self.notifications[str(guild_id)][category] = None
+            # the guild may have been left while deleting the message
+            notifications = self.notifications.get(guild_id)
+            if notifications is not None:
+                setattr(notifications, category, None)
 
     @tasks.loop(minutes=30)
     async def remove_notifications(self):
@@ -219,94 +313,147 @@ class TreeNotifCog(commands.Cog):
         cleans up messages sent more than an hour ago in the tree channel
         """
         # get the current time and offset it by an hour
-        cutoff = datetime.now(tz=pytz.utc) - timedelta(hours=1)
-        # iterate through guild IDs
-        guild_ids = [guild.id for guild in self.bot.guilds]
-        for guild_id in guild_ids:
-            # fetch the notification config
-            config = await self.config.get_data(guild_id, "notification")
-            # skip if the channel_id is not set
-            channel_id = config["channel_id"]
-            if channel_id is None:
-                continue
-            # fetch the channel
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(hours=1)
+        # messages older than this can't be bulk deleted
+        oldest = now - BULK_DELETE_MAX_AGE
+        # clean up the guilds at the same time, a few at once
+        guild_ids = tuple(self.notifications)
+        results = await asyncio.gather(
+            *(
+                self.remove_guild_notifications(
+                    guild_id=guild_id,
+                    cutoff=cutoff,
+                    oldest=oldest
+                )
+                for guild_id in guild_ids
+            ),
+            return_exceptions=True
+        )
+        # log any failures, without stopping the loop
+        for guild_id, result in zip(guild_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to remove notifications in guild: {guild_id}.\n{result}")
+
+    @remove_notifications.before_loop
+    async def before_remove_notifications(self):
+        """
+        waits until the bot user is known before cleaning up messages
+        """
+        await self.bot.wait_until_ready()
+
+    async def remove_guild_notifications(self, guild_id: int, cutoff: datetime, oldest: datetime):
+        """
+        cleans up messages sent before the cutoff in a guild's notification channel
+        """
+        # limit how many guilds are cleaned up at once
+        async with self.cleanup_semaphore:
+            # skip guilds which were left while waiting
+            if guild_id not in self.notifications:
+                return
+            await self.remove_channel_notifications(
+                guild_id=guild_id,
+                cutoff=cutoff,
+                oldest=oldest
+            )
+
+    async def remove_channel_notifications(self, guild_id: int, cutoff: datetime, oldest: datetime):
+        """
+        fetches the notification channel then bulk deletes the bot's messages
+        """
+        # fetch the notification config
+        config = self.config.view_data(guild_id, "notification")
+        # skip if the channel_id is not set
+        if config is None or config["channel_id"] is None:
+            return
+        channel_id = config["channel_id"]
+        # fetch the channel
+        channel = await self.fetch_channel(channel_id=channel_id)
+        if channel is None:
+            return
+        # fetch the newest message history from between the oldest time and the cutoff
+        # (at most 100 messages, which is the most that can be bulk deleted at once)
+        messages = []
+        bot_user_id = self.bot.user.id
+        async for message in channel.history(
+            limit=100,
+            before=cutoff,
+            after=oldest,
+            oldest_first=False
+        ):
+            if message.author.id == bot_user_id:
+                messages.append(message)
+        # bulk delete the messages
+        if len(messages) > 0:
+            await channel.delete_messages(messages, reason="Removing dead messages")
+
+    async def fetch_channel(self, channel_id: int) -> discord.abc.Messageable | None:
+        """
+        fetches a channel, caching it so it is only fetched from the API once
+        """
+        # check the cache first
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            # fetch the channel and cache it
             channel = await util_fetch_channel(
                 bot=self.bot,
                 channel_id=channel_id
             )
-            if channel is None:
-                return None
-            # fetch message history
-            messages = []
-            async for message in channel.history(limit=200):
-                if (
-                    message.author == self.bot.user and
-                    message.created_at < cutoff
-                ):
-                    messages.append(message)
-            # bulk delete the messages
-            if len(messages) > 0:
-                await channel.delete_messages(messages, reason="Removing dead messages")
-            # wait a while to prevent rate limiting
-            await asyncio.sleep(10)
+            if channel is not None:
+                self.channels[channel_id] = channel
+        return channel
 
     async def send_notification(self, config: dict, guild_id: int, category: str):
         """
         get the notification and send the message
         """
-        # only send at most one message at a time
-        async with self.message_mutex:
-            # skip if the message was already sent
-            if self.notifications[str(guild_id)][category] is not None:
-                return
-            # only try to send the message if enabled
-            message = None
-            if config[category]:
-                # fetch the message content and substitute pings and newlines
-                content = config["message"]
-                content = re.sub(r"(?i)`ping`", f"<@&{config[f'{category}_role_id']}>", content)
-                content = re.sub(r"(?i) ?`newline` ?", "\n", content)
-                # figure out which part of the message to use
-                index = 0
-                match category:
-                    case "insect":
-                        index = 0
-                    case "fruit":
-                        index = 1
-                    case "water":
-                        index = 2
-                # alter the message string with the correct index
-                content = re.sub(
-                    r"`.+?``.+?``.+?`",
-                    lambda match, index=index: self.substitute_string(match=match, index=index),
-                    content
-                )
-                # send the message
-                message = await util_send_message_in_channel(
-                    bot=self.bot,
-                    channel_id=config["channel_id"],
-                    content=content
-                )
-            # if the message wasn't sent, use a dummy message
-            if message is None:
-                message = DummyMessage()
-            # cache the message
-            self.notifications[str(guild_id)][category] = message
-        # delete it if it should be temporary
-        if config["temporary"]:
-            await self.delete_notification(
-                config=config,
-                guild_id=guild_id,
-                category=category
+        # fetch the guild's cached notifications
+        notifications = self.notifications.get(guild_id)
+        # skip if the guild was left, or the message was already sent, or is being sent
+        if notifications is None or getattr(notifications, category) is not None:
+            return
+        # claim the notification before sending, so it is only sent once
+        # (a dummy message can be deleted or logged if the event ends while sending)
+        claim = DummyMessage()
+        setattr(notifications, category, claim)
+        # only try to send the message if enabled
+        message = None
+        if config[category]:
+            # fetch the message content and substitute pings and newlines
+            content = config["message"]
+            content = PATTERN_PING.sub(f"<@&{config[f'{category}_role_id']}>", content)
+            content = PATTERN_NEWLINE.sub("\n", content)
+            # alter the message string with the correct index
+            content = self.choose_message(
+                content=content,
+                index=NOTIFICATION_INDEX[category]
+            )
+            # send the message
+            message = await util_send_message_in_channel(
+                bot=self.bot,
+                channel_id=config["channel_id"],
+                content=content
             )
+        # if the message wasn't sent, keep the dummy message
+        if message is None:
+            return
+        # delete the message if it should be temporary,
+        # or if the notification was removed while it was being sent
+        if config["temporary"] or getattr(notifications, category) is not claim:
+            await self.delete_message(message=message)
+            message = DummyMessage(created_at=message.created_at)
+        # replace the claim with the sent message
+        if getattr(notifications, category) is claim:
+            setattr(notifications, category, message)
 
     async def delete_notification(self, config: dict, guild_id: int, category: str):
         """
         delete the cached notification
         """
         if config[category]:
-            # check if the message exists
-            message = self.notifications[str(guild_id)][category]
+            # check if the message exists (and the guild has not been left)
+            notifications = self.notifications.get(guild_id)
+            message = getattr(notifications, category, None)
             if message is not None:
                 # delete the message and remove it from cache
                 await self.delete_message(message=message)
@@ -318,12 +465,13 @@ class TreeNotifCog(commands.Cog):
         # do not log "water" category - this is already done by the treelogging cog
         if category == "water":
             raise KeyError("Watering logs should not be handled by this function")
-        # check if the message exists
-        message = self.notifications[str(guild_id)][category]
+        # check if the message exists (and the guild has not been left)
+        notifications = self.notifications.get(guild_id)
+        message = getattr(notifications, category, None)
         if message is not None:
             # fetch the time that the message was created at
             created_at = message.created_at
-            deleted_at = datetime.now(tz=pytz.utc)
+            deleted_at = datetime.now(timezone.utc)
             await self.tree_logs.append_log(
                 guild_id=guild_id,
                 data = {
@@ -334,46 +482,47 @@ class TreeNotifCog(commands.Cog):
             )
 
     @staticmethod
-    def substitute_string(match: re.Match, index: int) -> bool:
+    def choose_message(content: str, index: int) -> str:
         """
-        Replaces a string such as `zero``one``two` with `zero` for index 0.
+        Replaces every string such as `zero``one``two` with zero for index 0,
+        in a single pass over the content.
         """
-        match = str(match.group())
-        match = match.strip("`").split("``")
-        return match[index]
+        # each message is captured in its own group
+        return PATTERN_NOTIFICATION_MESSAGES.sub(
+            lambda match: match.group(index + 1),
+            content
+        )
 
-    def tree_has_insect(self, buttons: set, guild_id: int) -> bool:
+    def tree_has_insect(self, buttons: int, guild_id: int) -> bool:
         """
         checks whether the modal button with the bugnet exists
         """
         # check for "bugnet" (custom emoji, no unicode equivalent)
-        if "bugnet" in buttons:
+        if buttons & EMOJI_BITS["bugnet"]:
             return True
         # all buttons become 🧺 for fruit catching,
         # the bugnet button only exists if there is also 💧 and 🔄
-        elif "💧" not in buttons:
+        elif not buttons & EMOJI_BITS["💧"]:
             # until this function returns False,
             # the following value will be a discord.Message, not None
-            if self.notifications[str(guild_id)]["insect"] is not None:
+            if getattr(self.notifications.get(guild_id), "insect", None) is not None:
                 return True
         # the bugnet button is gone
         return False
 
     @staticmethod
-    def tree_has_basket(buttons: set) -> bool:
+    def tree_has_basket(buttons: int) -> bool:
         """
         checks whether the modal button with the basket exists
         """
-        if "🧺" in buttons:
-            return True
-        return False
+        return bool(buttons & EMOJI_BITS["🧺"])
 
-    async def tree_needs_watering(self, guild_id: int):
+    @staticmethod
+    def tree_needs_watering(next_water: datetime, now: datetime) -> bool:
         """
         checks whether the current time exceeds the next watering time
         """
-        next_water, _ = await self.next_water.fetch_guild(guild_id=guild_id)
-        return datetime.now(tz=pytz.utc) > next_water
+        return now > next_water
 
     async def delete_message(self, message: discord.Message):
         """
@@ -1,6 +1,9 @@
 # import built-in packages
+import json
+import hashlib
 import logging
 import asyncio
+from pathlib import Path
 # import 3rd party packages
 import discord
 from discord import app_commands
@@ -35,9 +38,6 @@ class TreeBot(commands.Bot):
         # load the next_water instance
         self.next_water = TreeNextWater(self.tree_logs)
 
-        # variables from TreeLoggingCog, shared with ???
-        self.datetime_next_water = {}
-
         # why is this so long
         super().__init__(
             command_prefix,
@@ -53,10 +53,34 @@ class TreeBot(commands.Bot):
         await self.load_extension("cogs.treelogging")
         await self.load_extension("cogs.treenotification")
         # sync commands
-        await self.tree.sync()
+        await self.sync_commands()
 
         return await super().setup_hook()
 
+    async def sync_commands(self, path: str = "data/commands.sha256"):
+        """
+        Syncs the app commands with Discord,
+        only if they have changed since the last sync
+        """
+        # hash the commands which would be sent to discord, and the application they belong to
+        # (so running the same commands under another application still syncs them)
+        payload = {
+            "application_id": self.application_id,
+            "commands": [command.to_dict(self.tree) for command in self.tree.get_commands()]
+        }
+        digest = hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        # skip syncing if the commands are unchanged
+        path = Path(path)
+        if path.exists() and path.read_text(encoding="utf-8") == digest:
+            logger.info("App commands are unchanged, skipping sync")
+            return
+        # sync the commands, then save the hash
+        await self.tree.sync()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(digest, encoding="utf-8")
+
     async def on_ready(self):
         """
         Runs approximately when the bot has connected to the API.
@@ -83,13 +107,25 @@ class TreeBot(commands.Bot):
         await self.tree_logs.load_logs(guild_ids=[guild.id])
         await self.next_water.load_logs(guild_ids=[guild.id])
 
+    async def close(self):
+        """
+        Writes any pending logs and config before shutting down
+        """
+        await self.tree_logs.flush()
+        await self.config.flush()
+        await super().close()
+
     async def on_message(self, guild):
         # do nothing
         return
 
-# create intents
-intents = discord.Intents.default()
-intents.messages = True
+# create intents, only for the events the bot uses
+# guilds: the guild list on_ready and on_guild_join
+# guild_messages: message edits in the tree channels
+# message_content: the embeds of the edited messages
+intents = discord.Intents.none()
+intents.guilds = True
+intents.guild_messages = True
 intents.message_content = True
 
 # get the token and start the bot
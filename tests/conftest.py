@@ -0,0 +1,6 @@
+# import built-in packages
+import sys
+from pathlib import Path
+
+# import the bot's modules from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
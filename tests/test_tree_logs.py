@@ -0,0 +1,160 @@
+# import built-in packages
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+# import 3rd party packages
+import pytest
+# import utils
+from utils.constants import DATETIME_STRING_FORMAT
+from utils.tree_logs import TreeLogFile
+
+GUILD_ID = 1
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=1)
+
+def row(start_minutes: int, end_minutes: int, log_type: str = "water") -> dict[str, str]:
+    """
+    Creates a log row, with times in minutes after START
+    """
+    return {
+        'start': (START + timedelta(minutes=start_minutes)).strftime(DATETIME_STRING_FORMAT),
+        'end':   (START + timedelta(minutes=end_minutes)).strftime(DATETIME_STRING_FORMAT),
+        'type':  log_type
+    }
+
+def write_rows(tree_logs: TreeLogFile, rows: list[dict[str, str]]) -> None:
+    """
+    Appends rows straight to the file, like a change made outside of the bot,
+    making sure the modification time changes
+    """
+    log_path = tree_logs.get_log_path(GUILD_ID)
+    mtime = log_path.stat().st_mtime_ns
+    TreeLogFile.write_rows_file(log_path, rows)
+    os.utime(log_path, ns=(mtime + 1_000_000_000, mtime + 1_000_000_000))
+
+def read_lines(tree_logs: TreeLogFile) -> list[str]:
+    """
+    Returns the lines of the guild's log file, without the header
+    """
+    return tree_logs.get_log_path(GUILD_ID).read_text(encoding="utf-8").splitlines()[1:]
+
+async def read_log(tree_logs: TreeLogFile, **kwargs):
+    """
+    Reads the guild's logs between START and END
+    """
+    return await tree_logs.read_log(guild_id=GUILD_ID, start=START, end=END, **kwargs)
+
+@pytest.fixture
+def tree_logs(tmp_path):
+    """
+    A TreeLogFile with an empty log for GUILD_ID
+    """
+    tree_logs = TreeLogFile(directory=str(tmp_path))
+    asyncio.run(tree_logs.load_logs([GUILD_ID]))
+    return tree_logs
+
+def test_read_after_append_before_flush(tree_logs):
+    async def main():
+        # cache the logs, then append without waiting for the flush
+        assert (await read_log(tree_logs)).empty
+        await tree_logs.append_log(GUILD_ID, row(0, 30))
+        df = await read_log(tree_logs)
+        assert read_lines(tree_logs) == []
+        tree_logs.flush_task.cancel()
+        return df
+    df = asyncio.run(main())
+    assert len(df) == 1
+    assert df['start'].iloc[0] == START
+
+def test_read_after_append_without_cache(tree_logs):
+    async def main():
+        # the pending rows are included when the file is read for the first time
+        await tree_logs.append_log(GUILD_ID, row(0, 30))
+        df = await read_log(tree_logs)
+        tree_logs.flush_task.cancel()
+        return df
+    assert len(asyncio.run(main())) == 1
+
+def test_flush_writes_rows_once(tree_logs):
+    async def main():
+        await read_log(tree_logs)
+        await tree_logs.append_log(GUILD_ID, row(0, 30))
+        await tree_logs.append_log(GUILD_ID, row(40, 70))
+        tree_logs.flush_task.cancel()
+        tree_logs.flush_task = None
+        await tree_logs.flush()
+        await tree_logs.flush()
+        return await read_log(tree_logs)
+    df = asyncio.run(main())
+    assert len(read_lines(tree_logs)) == 2
+    assert tree_logs.pending == {}
+    assert len(df) == 2
+
+def test_flush_failure_keeps_rows(tree_logs, monkeypatch):
+    def write_rows_file(log_path, rows):
+        raise OSError("No space left on device")
+
+    async def main():
+        await read_log(tree_logs)
+        await tree_logs.append_log(GUILD_ID, row(0, 30))
+        tree_logs.flush_task.cancel()
+        tree_logs.flush_task = None
+        # the write fails, so the rows stay pending and a retry is scheduled
+        monkeypatch.setattr(tree_logs, "write_rows_file", write_rows_file)
+        await tree_logs.flush()
+        assert tree_logs.pending[GUILD_ID] == [row(0, 30)]
+        assert tree_logs.flush_task is not None
+        assert len(await read_log(tree_logs)) == 1
+        # the retry writes the rows
+        monkeypatch.undo()
+        tree_logs.flush_task.cancel()
+        tree_logs.flush_task = None
+        await tree_logs.flush()
+        assert tree_logs.flush_retry_delay == 1
+        return await read_log(tree_logs)
+    df = asyncio.run(main())
+    assert len(read_lines(tree_logs)) == 1
+    assert tree_logs.pending == {}
+    assert len(df) == 1
+
+def test_cache_reused_while_unchanged(tree_logs, monkeypatch):
+    calls = []
+    read_log_file = TreeLogFile.read_log_file
+
+    def counted_read_log_file(log_path):
+        calls.append(log_path)
+        return read_log_file(log_path)
+
+    monkeypatch.setattr(tree_logs, "read_log_file", counted_read_log_file)
+    asyncio.run(read_log(tree_logs))
+    asyncio.run(read_log(tree_logs))
+    assert len(calls) == 1
+
+def test_cache_reloads_when_file_changes(tree_logs):
+    assert asyncio.run(read_log(tree_logs)).empty
+    # change the file outside of the bot
+    write_rows(tree_logs, [row(0, 30), row(40, 70)])
+    assert len(asyncio.run(read_log(tree_logs))) == 2
+
+def test_read_log_removes_overlaps(tree_logs):
+    write_rows(tree_logs, [
+        row(0, 30),
+        # starts before the previous row ends
+        row(20, 50),
+        row(30, 60),
+        # other types are checked separately
+        row(10, 40, "insect"),
+        row(35, 45, "insect"),
+    ])
+    df = asyncio.run(read_log(tree_logs, filter_logs=None))
+    kept = [
+        (log_type, int((start - START).total_seconds() // 60))
+        for start, log_type in zip(df['start'], df['type'])
+    ]
+    assert sorted(kept) == [("insect", 10), ("water", 0), ("water", 30)]
+
+def test_read_log_sorts_rows(tree_logs):
+    write_rows(tree_logs, [row(40, 70), row(0, 30)])
+    df = asyncio.run(read_log(tree_logs))
+    assert df['start'].is_monotonic_increasing
+    assert len(df) == 2
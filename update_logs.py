@@ -1,21 +1,18 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
-files = os.listdir("data/")
-files = [file for file in files if os.path.splitext(file)[-1] == ".csv"]
-
-for file in files:
-    # skip non csv files
-    if os.path.splitext(file)[-1] != ".csv":
-        continue
-    path = os.path.join("data", file)
+def convert(path: str):
+    """
+    converts a log file from the old (wet, dry) format
+    """
     df = pd.read_csv(path)
     # skip files that don't conform to the old format
     if (
         "wet" not in df.columns or
         "dry" not in df.columns
     ):
-        continue
+        return
     # rename the columns
     df = df.rename(
         columns={
@@ -30,3 +27,13 @@ for file in files:
         path, index=False,
         encoding="utf-8"
     )
+
+if __name__ == "__main__":
+    files = os.listdir("data/")
+    # skip non csv files
+    files = [file for file in files if os.path.splitext(file)[-1] == ".csv"]
+    paths = [os.path.join("data", file) for file in files]
+
+    # convert the files at the same time
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(convert, paths))
@@ -30,7 +30,8 @@ async def channel_id_or_link_to_int(
     convert the value under the "channel_id" key to an integer
     """
     # ensure that the channel_id is valid & convert it to int
-    for i, (key, value) in enumerate(config_values.copy()):
+    # (items are only replaced, never added or removed, so the list can be updated in place)
+    for i, (key, value) in enumerate(config_values):
         if key == "channel_id":
             # skip if is None
             if value is None:
@@ -6,6 +6,24 @@ DATETIME_STRING_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # matches the timestamp from # <t:1735689600:R> 
 # which would be # 2025-1-1 00:00:00 UTC
-PATTERN_TIMESTAMP = re.compile(r"(?<=<t:)(\d+)(?=:?[a-zA-Z]?>)")
+# (the digits are in group 1)
+PATTERN_TIMESTAMP = re.compile(r"<t:(\d+)(?::[a-zA-Z])?>")
+# matches the text in the description of the tree embed (any case)
+PATTERN_YOUR_TREE = re.compile(r"your tree is", re.IGNORECASE)
+# matches the text shown when the tree can be watered (any case)
+PATTERN_READY = re.compile(r"ready to be watered", re.IGNORECASE)
 # matches digits (greedy)
 PATTERN_DIGITS = re.compile(r"[0-9]+")
+
+# matches a user mention such as `@/123456789`
+# (the user id is in group 1)
+PATTERN_MENTION = re.compile(r"`@/([0-9]+)`")
+# matches the "goal" placeholder within backticks
+PATTERN_GOAL = re.compile(r"(?i)(?<=`)goal(?=`)")
+# matches the `newline` placeholder and surrounding spaces
+PATTERN_NEWLINE = re.compile(r"(?i) ?`newline` ?")
+# matches the `ping` placeholder
+PATTERN_PING = re.compile(r"(?i)`ping`")
+# matches the notification messages such as `insect``fruit``water`,
+# with each message in its own group
+PATTERN_NOTIFICATION_MESSAGES = re.compile(r"`([^`]+)``([^`]+)``([^`]+)`")
@@ -1,19 +1,40 @@
 # import built-in packages
 import os
+import copy
 import json
 import logging
 from pathlib import Path
-from datetime import datetime
+from types import MappingProxyType
+from datetime import datetime, timezone
 import asyncio
 # import 3rd party packages
-import pytz
-import aiofiles
-# import utils & cogs
-from utils.constants import DATETIME_STRING_FORMAT
+try:
+    import orjson
+except ImportError: # fall back to the built-in json module
+    orjson = None
 
 # set up the logger
 logger = logging.getLogger(__name__)
 
+def dumps_json(data: dict) -> bytes:
+    """
+    Converts data to indented JSON bytes, using orjson if it is installed
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(data, indent=2).encode("utf-8")
+
+def loads_json(contents: bytes) -> dict:
+    """
+    Converts JSON bytes to data, using orjson if it is installed
+    """
+    if orjson is not None:
+        return orjson.loads(contents)
+    return json.loads(contents)
+
 def get_bot_token(path: str = "token.json", label: str = "stable"):
     """
     Retrieves a bot token from a JSON file.
@@ -32,6 +53,42 @@ def get_bot_token(path: str = "token.json", label: str = "stable"):
 
     return token
 
+# the config for a guild which hasn't been set up yet
+DEFAULT_GUILD_CONFIG = {
+    "general": {
+        "tree_name": None, # the name of the tree # string, ignore if None
+        "channel_id": None, # which channel the tree is in # int, ignore if None
+        "timezone": "UTC",
+        "outlier_duration": 60 * 60 * 2 # maximum number of seconds before it is counted as an outlier
+    },
+    "status_message": {
+        "channel_id": None, # integer, ignore if None
+        "total_hours": 24 * 7,
+        "valid_days": [6], # valid days (day 6 = Sunday)
+        "valid_hours": [11], # valid hours (11am UTC ~= 9pm AEST)
+        "next_message": [] # when the next message should be sent (unix timestamp), set per guild
+    },
+    "tree_goal": {
+        "channel_id": None, # integer, ignore if None
+        "reached": True, # whether the goal has been reached
+        "goal": 0, # default to zero - should never be reached
+        "greater_than": False, # whether it should check if the value is greater than
+        "pattern": "(?<=the #)[0-9]*(?= tallest)", # the regex pattern to find the float in the string
+        "message": "`@/` `newline` Tree has reached rank #`goal`!" # the message to be sent when the goal is reached
+    },
+    "notification": {
+        "channel_id": None, # integer, ignore if None
+        "insect": False, # bool, whether to notify for an insect
+        "fruit": False, # bool, whether to notify for an insect
+        "water": False, # bool, whether to notify for an insect
+        "temporary": True, # bool, whether to delete the message immediately after sending it
+        "message": "`ping` `Catch the insect!``Collect the fruit!``Water the tree!`",
+        "insect_role_id": "",
+        "fruit_role_id": "",
+        "water_role_id": ""
+    }
+}
+
 class BotConfigFile:
     """
     Manages the JSON file which stores the config.
@@ -42,6 +99,8 @@ class BotConfigFile:
         self.path = Path(path)
         self.data = {}
         self.mutex = asyncio.Lock()
+        self.save_mutex = asyncio.Lock()
+        self.save_task: asyncio.Task | None = None
         self.loaded = False
 
     async def load_json(self):
@@ -50,30 +109,68 @@ class BotConfigFile:
         """
         # if the json file exists
         if self.path.exists():
-            # open the json file for reading
-            async with aiofiles.open(self.path, "r", encoding="utf-8") as f:
-                # read the json file contents as a string
-                contents = await f.read()
+            # read the json file contents as bytes, in a single thread hop
+            contents = await asyncio.to_thread(self.path.read_bytes)
             # load json into the dictionary
+            # (JSON keys are strings, but the guild ids are kept as ints in memory)
             async with self.mutex:
-                self.data = json.loads(contents)
+                self.data = {
+                    int(guild_id): data
+                    for guild_id, data in loads_json(contents).items()
+                }
         # the json file doesn't exist
         else:
             await self.save_json()
         # set the "loaded" flag
         self.loaded = True
 
+    @staticmethod
+    def write_file(path: Path, contents: bytes):
+        """
+        Writes to a temporary file, then replaces the JSON file with it,
+        so the JSON file is never left partially written
+        """
+        temp_path = path.with_name(f"{path.name}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(contents)
+        os.replace(temp_path, path)
+
     async def save_json(self):
         """
         Saves the current data to the JSON file
         """
-        # convert the data to a json string
-        async with self.mutex:
-            contents = json.dumps(self.data, indent=4)
-        # open json file for writing
-        async with aiofiles.open(self.path, "w", encoding="utf-8") as f:
+        # only write one file at a time, in order
+        async with self.save_mutex:
+            # convert the data to json bytes
+            async with self.mutex:
+                contents = dumps_json(self.data)
             # write the current data to the json
-            await f.write(contents)
+            await asyncio.to_thread(self.write_file, self.path, contents)
+
+    async def save_json_later(self, delay: float = 0.05):
+        """
+        Waits, then saves the current data to the JSON file,
+        so that changes made close together are saved at once
+        """
+        await asyncio.sleep(delay)
+        self.save_task = None
+        await self.save_json()
+
+    def schedule_save(self):
+        """
+        Saves the data to the JSON file soon, if a save isn't already scheduled
+        """
+        if self.save_task is None:
+            self.save_task = asyncio.create_task(self.save_json_later())
+
+    async def flush(self):
+        """
+        Saves the data immediately if a save is scheduled
+        """
+        if self.save_task is not None:
+            self.save_task.cancel()
+            self.save_task = None
+            await self.save_json()
 
     async def get_data(self, guild_id: int, key: str) -> dict:
         """
@@ -81,7 +178,7 @@ class BotConfigFile:
         """
         async with self.mutex:
             try:
-                data = self.data.get(str(guild_id), {}).get(key)
+                data = self.data.get(guild_id, {}).get(key)
             except KeyError as e:
                 logger.warning(f"JSON file does not have key: [{guild_id}][{key}]\n{e}")
                 return None
@@ -94,14 +191,25 @@ class BotConfigFile:
             else:
                 return data.copy()
 
+    def view_data(self, guild_id: int, key: str) -> MappingProxyType | None:
+        """
+        Gets a read-only view of the data with a specified key for a specified guild.
+        Does not copy the data, so it is cheap enough to call on every event.
+        """
+        # no await, so the data cannot change while it is being read
+        data = self.data.get(guild_id, {}).get(key)
+        if data is None:
+            logger.warning(f"Data for guild {guild_id} with key {key} is None")
+            return None
+        return MappingProxyType(data)
+
     async def set_data(self, guild_id: int, key: str, data: dict) -> bool:
         """
         Sets the data with a specified key for a specified guild
         """
         async with self.mutex:
             try:
-                self.data.setdefault(str(guild_id), {})
-                self.data[str(guild_id)][key] = data
+                self.data.setdefault(guild_id, {})[key] = data
             except KeyError as e:
                 logger.warning(f"Unknown KeyError: [{guild_id}][{key}]\n{e}")
                 return False
@@ -109,7 +217,7 @@ class BotConfigFile:
                 logger.warning(f"Unknown Exception: \n{e}")
                 return False
         # save the new data to the json file
-        await self.save_json()
+        self.schedule_save()
         return True
 
     async def set_default_data(self, guild_ids: list[int]):
@@ -117,49 +225,17 @@ class BotConfigFile:
         Sets default data for guilds not in the JSON file
         """
         # fetch the current time with hour precision
-        dt = datetime.now(tz=pytz.utc)
+        dt = datetime.now(timezone.utc)
         dt = dt.replace(minute=0, second=0, microsecond=0)
         # acquire mutex lock
         async with self.mutex:
             # iterate through list of guild ids
             for guild_id in guild_ids:
-                guild_id = str(guild_id)
-                self.data.setdefault(
-                    guild_id,
-                    {
-                        "general": {
-                            "tree_name": None, # the name of the tree # string, ignore if None
-                            "channel_id": None, # which channel the tree is in # int, ignore if None
-                            "timezone": "UTC",
-                            "outlier_duration": 60 * 60 * 2 # maximum number of seconds before it is counted as an outlier
-                        },
-                        "status_message": {
-                            "channel_id": None, # integer, ignore if None
-                            "total_hours": 24 * 7,
-                            "valid_days": [6], # valid days (day 6 = Sunday)
-                            "valid_hours": [11], # valid hours (11am UTC ~= 9pm AEST)
-                            "next_message": [dt.replace(hour=11).strftime(DATETIME_STRING_FORMAT)] # when the next message should be sent
-                        },
-                        "tree_goal": {
-                            "channel_id": None, # integer, ignore if None
-                            "reached": True, # whether the goal has been reached
-                            "goal": 0, # default to zero - should never be reached
-                            "greater_than": False, # whether it should check if the value is greater than
-                            "pattern": "(?<=the #)[0-9]*(?= tallest)", # the regex pattern to find the float in the string
-                            "message": "`@/` `newline` Tree has reached rank #`goal`!" # the message to be sent when the goal is reached
-                        },
-                        "notification": {
-                            "channel_id": None, # integer, ignore if None
-                            "insect": False, # bool, whether to notify for an insect
-                            "fruit": False, # bool, whether to notify for an insect
-                            "water": False, # bool, whether to notify for an insect
-                            "temporary": True, # bool, whether to delete the message immediately after sending it
-                            "message": "`ping` `Catch the insect!``Collect the fruit!``Water the tree!`",
-                            "insect_role_id": "",
-                            "fruit_role_id": "",
-                            "water_role_id": ""
-                        }
-                    }
-                )
+                # skip guilds which already have a config
+                if guild_id in self.data:
+                    continue
+                config = copy.deepcopy(DEFAULT_GUILD_CONFIG)
+                config["status_message"]["next_message"] = [int(dt.replace(hour=11).timestamp())]
+                self.data[guild_id] = config
         # save the updated data
-        await self.save_json()
+        self.schedule_save()
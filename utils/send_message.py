@@ -1,16 +1,42 @@
 # import built-in packages
+import time
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 from dataclasses import dataclass, field
 # import 3rd party packages
-import pytz
 import discord
 from discord.ext import commands
 
 # set up the logger
 logger = logging.getLogger(__name__)
 
+# how long (seconds) to remember whether the bot can send messages in a channel
+SEND_PERMISSION_TTL = 30
+# channel id -> (monotonic time when checked, whether the bot can send messages)
+send_permissions: dict[int, tuple[float, bool]] = {}
+
+def can_send_messages(channel: discord.abc.GuildChannel) -> bool:
+    """
+    Checks whether the bot can send messages in the channel,
+    only recalculating the permissions every SEND_PERMISSION_TTL seconds
+    """
+    now = time.monotonic()
+    cached = send_permissions.get(channel.id)
+    if cached is not None and now - cached[0] < SEND_PERMISSION_TTL:
+        return cached[1]
+    # calculate the permissions from the roles and overwrites
+    can_send = channel.permissions_for(channel.guild.me).send_messages
+    send_permissions[channel.id] = (now, can_send)
+    return can_send
+
+def forget_send_permission(channel_id: int):
+    """
+    Forgets whether the bot can send messages in the channel,
+    so it is recalculated next time
+    """
+    send_permissions.pop(channel_id, None)
+
 async def util_fetch_channel(
     bot: commands.Bot,
     channel_id: int
@@ -38,6 +64,23 @@ async def util_fetch_channel(
 
     return channel
 
+async def util_can_send_in_channel(
+    bot: commands.Bot,
+    channel_id: int
+) -> bool:
+    """
+    Checks whether the channel exists and the bot can send messages in it.
+    """
+    # fetch the channel
+    channel = await util_fetch_channel(
+        bot=bot,
+        channel_id=channel_id
+    )
+    if channel is None:
+        return False
+    # check the permission to send messages
+    return can_send_messages(channel)
+
 async def util_send_message_in_channel(
     bot: commands.Bot,
     channel_id: int,
@@ -56,8 +99,7 @@ async def util_send_message_in_channel(
         return None
 
     # skip if no permission to send messages
-    permissions = channel.permissions_for(channel.guild.me)
-    if not permissions.send_messages:
+    if not can_send_messages(channel):
         # logger.warning(f"No permission to send messages in channel %d", channel_id)
         return None
 
@@ -69,6 +111,8 @@ async def util_send_message_in_channel(
         logger.warning(f"The channel could not be found: {channel_id}.\n{e}")
         return None
     except discord.Forbidden as e:
+        # the cached permissions are out of date
+        forget_send_permission(channel_id)
         logger.warning(f"Insufficient permissions to send messages in channel: {channel_id}.\n{e}")
         return None
     except ValueError as e:
@@ -86,4 +130,10 @@ class DummyMessage:
     """
     dummy message storing the created_at variable
     """
-    created_at: datetime = field(default_factory=lambda: datetime.now(pytz.utc))
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    async def delete(self):
+        """
+        there is no message to delete
+        """
+        return
@@ -0,0 +1,27 @@
+# import built-in packages
+from functools import lru_cache
+from datetime import tzinfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+@lru_cache(maxsize=1)
+def timezone_names() -> dict[str, str]:
+    """
+    Maps the lowercase name of every available timezone to its actual name.
+    """
+    return {name.lower(): name for name in available_timezones()}
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str) -> tzinfo:
+    """
+    Gets the timezone with a specified name (ignoring case), only looking it up once per name.
+    Raises zoneinfo.ZoneInfoNotFoundError if the timezone doesn't exist.
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        pass
+    # the name may have the wrong case, e.g. "australia/sydney"
+    actual_name = timezone_names().get(name.lower())
+    if actual_name is None:
+        raise ZoneInfoNotFoundError(f"No time zone found with key {name}")
+    return ZoneInfo(actual_name)
@@ -0,0 +1,14 @@
+# import 3rd party packages
+import discord
+# import utils
+from utils.constants import PATTERN_YOUR_TREE
+
+def is_tree_embed(embed: discord.Embed, tree_name: str) -> bool:
+    """
+    Checks whether an embed is the tree with the specified name.
+    """
+    # the title and description can be None
+    return bool(
+        embed.title and tree_name in embed.title and
+        embed.description and PATTERN_YOUR_TREE.search(embed.description)
+    )
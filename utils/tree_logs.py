@@ -1,20 +1,38 @@
+import os
 import asyncio
-from typing import Any
+import logging
+from typing import Any, Iterable
 from pathlib import Path
-from datetime import datetime, timedelta
-import pytz
+from datetime import datetime, timedelta, timezone
+import numpy
 import pandas
-from utils.constants import DATETIME_STRING_FORMAT
+
+# set up the logger
+logger = logging.getLogger(__name__)
 
 class TreeLogFile:
     """
     Manages the CSV logs with mutex
     """
 
+    # the order of the columns in the CSV logs
+    COLUMNS = ('start', 'end', 'type')
+    # the types of log, stored as a categorical column (in sorted order)
+    LOG_TYPES = pandas.CategoricalDtype(['fruit', 'insect', 'water'])
+    # the longest wait (seconds) before retrying a failed write, doubling from 1 second
+    MAX_FLUSH_RETRY_DELAY = 300
+
     def __init__(self, directory: str = "data") -> None:
         self.dir = Path(directory)
         self.mutex: dict[int, asyncio.Lock] = {}
-        self.loaded = False
+        self.cache: dict[int, pandas.DataFrame] = {}
+        self.cache_mtime: dict[int, int] = {}
+        self.paths: dict[int, Path] = {}
+        self.pending: dict[int, list[dict[str, Any]]] = {}
+        self.flush_task: asyncio.Task | None = None
+        self.flush_retry_delay: float = 1
+        # set once the logs have been loaded
+        self.loaded = asyncio.Event()
 
     async def load_logs(
         self,
@@ -26,72 +44,222 @@ class TreeLogFile:
         :param guild_ids: A list of guild IDs to create a mutex lock for
         :type guild_ids: list[int]
         """
+        missing_paths = []
         for guild_id in guild_ids:
             # create the mutex lock
             self.mutex.setdefault(guild_id, asyncio.Lock())
-            # ensure the logs exist
-            log_path = self.dir.joinpath(f"{guild_id}.csv")
+            # find the logs which don't exist
+            log_path = self.get_log_path(guild_id)
             if not log_path.exists():
-                df = pandas.DataFrame(
-                    columns=['start', 'end', 'type']
-                )
-                await asyncio.to_thread(
-                    lambda log_path=log_path, df=df: df.to_csv(
-                        log_path, index=False,
-                        encoding="utf-8"
-                    )
-                )
+                missing_paths.append(log_path)
+        # create all of the missing logs at once
+        if missing_paths:
+            await asyncio.to_thread(self.create_log_files, missing_paths)
         # signal that loading is finished
-        self.loaded = True
+        self.loaded.set()
 
-    def read_log_chunked(
+    def get_log_path(
         self,
-        log_path: Path,
-        start: datetime,
-        end: datetime,
-        filter_logs: tuple[str, ...] | None
+        guild_id: int
+    ) -> Path:
+        """
+        Returns the path of a guild's CSV log, only building it once per guild
+
+        :param guild_id: The guild ID of the guild you want the log path for
+        :type guild_id: int
+        :return: The path of the CSV log
+        :rtype: Path
+        """
+        log_path = self.paths.get(guild_id)
+        if log_path is None:
+            log_path = self.paths[guild_id] = self.dir.joinpath(f"{guild_id}.csv")
+        return log_path
+
+    @classmethod
+    def create_log_files(
+        cls,
+        log_paths: list[Path]
+    ) -> None:
+        """
+        Creates empty CSV logs, containing only the header
+
+        :param log_paths: The paths of the CSV logs
+        :type log_paths: list[Path]
+        """
+        header = (",".join(cls.COLUMNS) + "\n").encode("utf-8")
+        for log_path in log_paths:
+            log_path.write_bytes(header)
+
+    @classmethod
+    def rows_to_frame(
+        cls,
+        rows: list[list[str]] | list[dict[str, Any]]
+    ) -> pandas.DataFrame:
+        """
+        Converts rows in the CSV format to a dataframe with UTC timestamps
+
+        :param rows: The rows to be converted, as [start, end, type] or dicts
+        :type rows: list[list[str]] | list[dict[str, Any]]
+        :return: Pandas dataframe containing the rows
+        :rtype: DataFrame
+        """
+        # convert dicts to the column order of the CSV
+        rows = [
+            tuple(row[column] for column in cls.COLUMNS) if isinstance(row, dict) else row
+            for row in rows
+        ]
+        starts, ends, types = zip(*rows) if rows else ((), (), ())
+        # numpy parses "%Y-%m-%d %H:%M:%S" as ISO 8601 without a format string
+        return pandas.DataFrame({
+            'start': pandas.to_datetime(numpy.array(starts, dtype="datetime64[s]"), utc=True),
+            'end':   pandas.to_datetime(numpy.array(ends,   dtype="datetime64[s]"), utc=True),
+            'type':  pandas.Categorical(types, dtype=cls.LOG_TYPES)
+        })
+
+    @classmethod
+    def read_log_file(
+        cls,
+        log_path: Path
     ) -> pandas.DataFrame:
         """
-        Reads the logs in chunks and returns the logs within the specified interval
+        Reads the entire log file and parses the timestamps as UTC
 
-        :param log_path: Description
+        :param log_path: The path of the CSV log
+        :type log_path: Path
+        :return: Pandas dataframe containing all of the logs
+        :rtype: DataFrame
+        """
+        # read the whole file and skip the header
+        lines = log_path.read_bytes().decode("utf-8").splitlines()[1:]
+        # split into columns, skipping malformed rows
+        rows = [line.split(",") for line in lines]
+        rows = [row for row in rows if len(row) == 3]
+        return cls.rows_to_frame(rows)
+
+    async def fetch_cached_log(
+        self,
+        guild_id: int,
+        log_path: Path
+    ) -> pandas.DataFrame:
+        """
+        Returns the entire log of a guild, only reading the file
+        when it has been modified since it was last cached
+
+        :param guild_id: The guild ID of the guild you want to fetch the logs for
+        :type guild_id: int
+        :param log_path: The path of the CSV log
+        :type log_path: Path
+        :return: Pandas dataframe containing all of the logs (do not modify)
+        :rtype: DataFrame
+        """
+        # readers do not need the lock while the cached logs are up to date
+        if self.cache_mtime.get(guild_id) == log_path.stat().st_mtime_ns:
+            return self.cache[guild_id]
+        async with self.mutex[guild_id]:
+            mtime = log_path.stat().st_mtime_ns
+            # reload the logs if the file has changed (and no one else has reloaded it)
+            if self.cache_mtime.get(guild_id) != mtime:
+                df = await asyncio.to_thread(
+                    self.read_log_file, log_path
+                )
+                # include the rows which have not been written yet
+                if self.pending.get(guild_id):
+                    df = pandas.concat(
+                        [df, self.rows_to_frame(self.pending[guild_id])],
+                        ignore_index=True
+                    )
+                self.cache[guild_id] = df
+                self.cache_mtime[guild_id] = mtime
+            return self.cache[guild_id]
+
+    @staticmethod
+    def read_last_row_file(
+        log_path: Path,
+        filter_logs: tuple[str, ...] | None,
+        block_size: int = 4096
+    ) -> dict[str, Any] | None:
+        """
+        Reads only the end of the log file and returns the last matching row,
+        doubling the number of bytes read until a matching row is found
+
+        :param log_path: The path of the CSV log
         :type log_path: Path
-        :param start: The earliest timestamp that you want to fetch
-        :type start: datetime
-        :param end: The latest timestamp that you want to fetch
-        :type end: datetime
         :param filter_logs: The log types which you want to fetch
         :type filter_logs: tuple[str, ...] | None
-        :return: Pandas dataframe containing the logs
-        :rtype: DataFrame
+        :param block_size: The number of bytes to read from the end of the file first
+        :type block_size: int
+        :return: The last row, or None if there is no matching row in the file
+        :rtype: dict[str, Any] | None
         """
-        # iterate through the csv file in chunks
-        chunks = []
-        for chunk in pandas.read_csv(
-            log_path,
-            chunksize=10000,
-            parse_dates=['start', 'end'],
-            date_format=DATETIME_STRING_FORMAT
-        ):
-            # filter by log type
-            if filter_logs is not None:
-                chunk = chunk[chunk['type'].isin(filter_logs)]
-
-            # set timezone as UTC
-            chunk[['start', 'end']] = chunk[['start', 'end']].apply(
-                lambda col: col.dt.tz_localize(pytz.utc)
-            )
+        with open(log_path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            while True:
+                # seek to the last block of the file
+                offset = max(0, size - block_size)
+                f.seek(offset)
+                lines = f.read().split(b"\n")
+                # the first line is either the header or incomplete
+                for line in reversed(lines[1:]):
+                    values = line.decode("utf-8").strip().split(",")
+                    # skip empty or malformed lines
+                    if len(values) != 3:
+                        continue
+                    # skip other log types
+                    if filter_logs is not None and values[2] not in filter_logs:
+                        continue
+                    start = datetime.fromisoformat(values[0])
+                    end = datetime.fromisoformat(values[1])
+                    return {
+                        'start': start.replace(tzinfo=timezone.utc),
+                        'end': end.replace(tzinfo=timezone.utc),
+                        'type': values[2]
+                    }
+                # the whole file has been read
+                if offset == 0:
+                    return None
+                # read further back
+                block_size *= 2
+
+    async def read_last_row(
+        self,
+        guild_id: int,
+        filter_logs: tuple[str, ...] | None = ('water',)
+    ) -> dict[str, Any] | None:
+        """
+        Returns the most recently appended log of the specified types,
+        without parsing the entire file
 
-            # filter within the specified interval
-            chunk = chunk[(chunk['end'] >= start) & (chunk['start'] <= end)]
+        :param guild_id: The guild ID of the guild you want to fetch the log for
+        :type guild_id: int
+        :param filter_logs: The log types which you want to fetch
+        :type filter_logs: tuple[str, ...] | None
+        :return: The last row, or None if there is no matching row
+        :rtype: dict[str, Any] | None
+        """
+        log_path = self.get_log_path(guild_id)
+        # ignore if the log path does not exist
+        if not log_path.exists():
+            return None
 
-            # add the chunk to the list
-            chunks.append(chunk)
+        # wait until logs are loaded
+        await self.loaded.wait()
 
-        if chunks:
-            return pandas.concat(chunks, ignore_index=True)
-        else:
-            return pandas.DataFrame()
+        async with self.mutex[guild_id]:
+            # check the rows which have not been written yet
+            for row in reversed(self.pending.get(guild_id, [])):
+                if filter_logs is None or row['type'] in filter_logs:
+                    start = datetime.fromisoformat(row['start'])
+                    end = datetime.fromisoformat(row['end'])
+                    return {
+                        'start': start.replace(tzinfo=timezone.utc),
+                        'end': end.replace(tzinfo=timezone.utc),
+                        'type': row['type']
+                    }
+            # read the end of the csv log
+            return await asyncio.to_thread(
+                self.read_last_row_file,
+                log_path, filter_logs
+            )
 
     async def read_log(
         self,
@@ -114,85 +282,80 @@ class TreeLogFile:
         :return: Pandas dataframe containing the logs
         :rtype: DataFrame
         """
-        log_path = self.dir.joinpath(f"{guild_id}.csv")
+        log_path = self.get_log_path(guild_id)
         # ignore if the log path does not exist
         if not log_path.exists():
             return None
 
         # wait until logs are loaded
-        while not self.loaded:
-            await asyncio.sleep(1)
+        await self.loaded.wait()
 
         # set default values for start and end if they are None
-        start = start or (datetime.now(tz=pytz.utc) - timedelta(days=1))
-        end = end or datetime.now(tz=pytz.utc)
+        now = datetime.now(timezone.utc)
+        start = start or (now - timedelta(days=1))
+        end = end or now
 
-        # read the csv log
-        async with self.mutex[guild_id]:
-            df = await asyncio.to_thread(
-                lambda
-                log_path=log_path,
-                start=start, end=end,
-                filter_logs=filter_logs:
-                    self.read_log_chunked(
-                        log_path=log_path,
-                        start=start, end=end,
-                        filter_logs=filter_logs
-                    )
-            )
+        # fetch the cached logs
+        df = await self.fetch_cached_log(
+            guild_id=guild_id,
+            log_path=log_path
+        )
+
+        # filter the log type
+        if filter_logs is not None:
+            df = df[df['type'].isin(filter_logs)]
+
+        # filter within the specified interval
+        start64 = pandas.Timestamp(start).to_datetime64()
+        end64 = pandas.Timestamp(end).to_datetime64()
+        df = df[(df['end'].values >= start64) & (df['start'].values <= end64)]
 
-        def remove_overlaps(group: pandas.DataFrame) -> pandas.DataFrame:
+        def find_valid_rows(df: pandas.DataFrame) -> list[bool]:
             """
             overlaps may occur when on_raw_message_edit is not processed fast enough
             this often occurs when the bot is starting up, since processing is deferred
             until after the config is loaded
             
-            :param group: Description
-            :type group: pandas.DataFrame
-            :return: Description
-            :rtype: DataFrame
+            :param df: The logs, sorted by type then start
+            :type df: pandas.DataFrame
+            :return: Whether each row starts after the previous valid row of its type ends
+            :rtype: list[bool]
             """
-            # first row is always valid
-            valid_rows = [True]
-            prev_end = group.iloc[0]['end']
-            # iterate through group
-            for idx in range(1, len(group)):
-                current_start = group.iloc[idx]['start']
-                # only keep rows where (start) >= (previous end)
-                if current_start >= prev_end:
+            # compare plain integers rather than timestamps
+            starts = df['start'].values.view("i8").tolist()
+            ends = df['end'].values.view("i8").tolist()
+            types = df['type'].cat.codes.tolist()
+            valid_rows = []
+            prev_type = None
+            prev_end = 0
+            for start, end, log_type in zip(starts, ends, types):
+                # the first row of each type is always valid,
+                # otherwise only keep rows where (start) >= (previous end)
+                if log_type != prev_type or start >= prev_end:
                     valid_rows.append(True)
-                    prev_end = group.iloc[idx]['end']
+                    prev_type = log_type
+                    prev_end = end
                 else:
                     # row overlaps, skip row
                     valid_rows.append(False)
-            # filter by valid rows
-            result = group[valid_rows].copy()
-            # add back the type
-            result['type'] = group.name
-            # return the result
-            return result
-
-        # set timezone as UTC
-        # df[['start', 'end']] = df[['start', 'end']].apply(
-        #     lambda col: col.dt.tz_localize(pytz.utc)
-        # )
-
-        # filter the log type
-        # if filter_logs is not None:
-        #     df = df[df['type'].isin(filter_logs)]
-
-        # filter within the specified interval
-        # df = df[(df['end'] >= start) & (df['start'] <= end)]
+            return valid_rows
 
         # only keep rows where start is before end
         df = df[(df['start'] <= df['end'])]
 
-        # sort by type, start and end
-        df = df.sort_values(by=['type', 'start'])
+        # sort by type and start, unless the logs are already in that order
+        # (rows are appended in order, so this is usually only a check)
+        codes = df['type'].cat.codes.values
+        starts = df['start'].values
+        in_order = (
+            (codes[1:] > codes[:-1]) |
+            ((codes[1:] == codes[:-1]) & (starts[1:] >= starts[:-1]))
+        )
+        if not in_order.all():
+            df = df.sort_values(by=['type', 'start'])
 
-        # remove overlapping logs
-        df = df.groupby('type', group_keys=False)
-        df = df.apply(remove_overlaps, include_groups=False)
+        # remove overlapping logs, in a single pass over every type
+        df = df[numpy.array(find_valid_rows(df), dtype=bool)]
 
         # remove invalid values
         return df.dropna()
@@ -203,7 +366,9 @@ class TreeLogFile:
         data: dict[str, Any]
     ) -> None:
         """
-        Adds a row of data to the end of the CSV log
+        Adds a row of data to the end of the CSV log.
+        The row is written to the file by the next flush,
+        which happens about a second later.
         
         :param guild_id: The guild ID of the guild you want to append the logs to
         :type guild_id: int
@@ -211,22 +376,97 @@ class TreeLogFile:
         The key is the column label, the value is the data.
         :type data: dict[str, Any]
         """
-        log_path = self.dir.joinpath(f"{guild_id}.csv")
-
         # wait until logs are loaded
-        while not self.loaded:
-            await asyncio.sleep(1)
+        await self.loaded.wait()
 
-        # append to the logs
+        # queue the row to be written
         async with self.mutex[guild_id]:
-            df = pandas.DataFrame([data])
-            await asyncio.to_thread(
-                lambda log_path=log_path, df=df: df.to_csv(
-                    log_path, index=False,
-                    encoding="utf-8", mode="a",
-                    header=False
+            self.pending.setdefault(guild_id, []).append(data)
+            # append to the cached logs instead of reading the file again
+            if guild_id in self.cache_mtime:
+                self.cache[guild_id] = pandas.concat(
+                    [self.cache[guild_id], self.rows_to_frame([data])],
+                    ignore_index=True
                 )
-            )
+
+        # schedule a flush, if there isn't one already
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_later())
+
+    async def flush_later(
+        self,
+        delay: float = 1
+    ) -> None:
+        """
+        Waits, then writes all of the pending rows to the CSV logs,
+        so that rows appended close together are written at once
+
+        :param delay: The number of seconds to wait before writing
+        :type delay: float
+        """
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        await self.flush()
+
+    @classmethod
+    def write_rows_file(
+        cls,
+        log_path: Path,
+        rows: list[dict[str, Any]]
+    ) -> None:
+        """
+        Appends rows to the end of a CSV log
+
+        :param log_path: The path of the CSV log
+        :type log_path: Path
+        :param rows: The rows to append, with 'start', 'end' and 'type' as strings
+        :type rows: list[dict[str, Any]]
+        """
+        lines = "".join(
+            ",".join(str(row[column]) for column in cls.COLUMNS) + "\n"
+            for row in rows
+        )
+        with open(log_path, "ab") as f:
+            f.write(lines.encode("utf-8"))
+
+    async def flush(self) -> None:
+        """
+        Writes all of the pending rows to the CSV logs,
+        and schedules a retry if any of them could not be written
+        """
+        failed = False
+        for guild_id in list(self.pending):
+            log_path = self.get_log_path(guild_id)
+            async with self.mutex[guild_id]:
+                rows = self.pending.get(guild_id)
+                if not rows:
+                    self.pending.pop(guild_id, None)
+                    continue
+                # check whether the cached logs are up to date
+                is_cached = (
+                    log_path.exists() and
+                    self.cache_mtime.pop(guild_id, None) == log_path.stat().st_mtime_ns
+                )
+                # append all of the rows at once
+                # (if it fails, the rows stay pending and are written by the retry)
+                try:
+                    await asyncio.to_thread(self.write_rows_file, log_path, rows)
+                except OSError:
+                    logger.exception(f"Failed to write {len(rows)} rows to the logs of guild: {guild_id}.")
+                    failed = True
+                    continue
+                # only forget the rows once they have been written
+                del self.pending[guild_id]
+                # the cached logs already contain the rows
+                if is_cached:
+                    self.cache_mtime[guild_id] = log_path.stat().st_mtime_ns
+
+        if not failed:
+            self.flush_retry_delay = 1
+        elif self.flush_task is None:
+            # retry later, waiting twice as long after every failure
+            self.flush_task = asyncio.create_task(self.flush_later(self.flush_retry_delay))
+            self.flush_retry_delay = min(self.flush_retry_delay * 2, self.MAX_FLUSH_RETRY_DELAY)
 
 class TreeNextWater:
     """
@@ -244,10 +484,14 @@ class TreeNextWater:
         :type tree_logs: TreeLogFile
         """
         self.tree_logs = tree_logs
-        self.mutex = asyncio.Lock()
+        # the dicts are only changed without awaiting in between,
+        # so they can be read and written without a lock
         self.next_water: dict[int, datetime] = {}
         self.water_duration: dict[int, timedelta] = {}
-        self.loaded = False
+        # set once the logs have been loaded
+        self.loaded = asyncio.Event()
+        # set whenever next_water changes
+        self.changed = asyncio.Event()
 
     async def load_logs(
         self,
@@ -259,33 +503,31 @@ class TreeNextWater:
         :param guild_ids: Guilds to update
         :type guild_ids: list[int]
         """
-        async with self.mutex:
-            for guild_id in guild_ids:
-                # get the current time
-                now = datetime.now(tz=pytz.utc)
-                # fetch the most recent log
-                df = await self.tree_logs.read_log(
-                    guild_id=guild_id
-                )
-                # default values if the data doesn't exist
-                if df is None:
-                    next_water = now
-                    water_duration = timedelta()
-                elif df.empty:
-                    next_water = now
-                    water_duration = timedelta()
-                else:
-                    # get the last row
-                    last_row = df.iloc[-1]
-                    # set 'end' as next_water
-                    next_water = last_row['end']
-                    # set the duration as end - start
-                    water_duration = last_row['end'] - last_row['start']
-                # set the values to next_water and water_duration
-                self.next_water.setdefault(guild_id, next_water)
-                self.water_duration.setdefault(guild_id, water_duration)
-            # signal that loading is finished
-            self.loaded = True
+        for guild_id in guild_ids:
+            # get the current time
+            now = datetime.now(timezone.utc)
+            # read the most recent log from the end of the file
+            last_row = await self.tree_logs.read_last_row(
+                guild_id=guild_id
+            )
+            # ignore logs which ended more than a day ago
+            if last_row is not None and last_row['end'] < now - timedelta(days=1):
+                last_row = None
+            # default values if the data doesn't exist
+            if last_row is None:
+                next_water = now
+                water_duration = timedelta()
+            else:
+                # set 'end' as next_water
+                next_water = last_row['end']
+                # set the duration as end - start
+                water_duration = last_row['end'] - last_row['start']
+            # set next_water and water_duration, if they haven't been updated already
+            self.next_water.setdefault(guild_id, next_water)
+            self.water_duration.setdefault(guild_id, water_duration)
+        # signal that loading is finished
+        self.loaded.set()
+        self.changed.set()
 
     async def update_guild(
         self,
@@ -302,12 +544,12 @@ class TreeNextWater:
         :type timestamp: datetime
         """
         # wait until logs are loaded
-        while not self.loaded:
-            await asyncio.sleep(1)
+        await self.loaded.wait()
 
-        async with self.mutex:
-            self.next_water[guild_id] = timestamp
-            self.water_duration[guild_id] = duration
+        self.next_water[guild_id] = timestamp
+        self.water_duration[guild_id] = duration
+        # wake up anything waiting for next_water to change
+        self.changed.set()
 
     async def fetch_guild(
         self,
@@ -322,13 +564,38 @@ class TreeNextWater:
         :rtype: datetime
         """
         # wait until logs are loaded
-        while not self.loaded:
-            await asyncio.sleep(1)
+        await self.loaded.wait()
 
         # get the values from the dict
-        async with self.mutex:
-            next_water = self.next_water.get(guild_id, datetime.now(tz=pytz.utc))
-            water_duration = self.water_duration.get(guild_id, timedelta())
+        next_water = self.next_water.get(guild_id, datetime.now(timezone.utc))
+        water_duration = self.water_duration.get(guild_id, timedelta())
 
         # return the values
         return next_water, water_duration
+
+    async def fetch_guilds(
+        self,
+        guild_ids: Iterable[int]
+    ) -> dict[int, tuple[datetime, timedelta]]:
+        """
+        Fetch the times when the trees can be watered next for several guilds,
+        from a single snapshot
+        
+        :param guild_ids: The guilds you want to fetch
+        :type guild_ids: Iterable[int]
+        :return: The timestamp of when it can be watered next and the last duration, for each guild
+        :rtype: dict[int, tuple[datetime, timedelta]]
+        """
+        # wait until logs are loaded
+        await self.loaded.wait()
+
+        # get the values from the dicts
+        # (there is no await, so every guild is from the same snapshot)
+        now = datetime.now(timezone.utc)
+        return {
+            guild_id: (
+                self.next_water.get(guild_id, now),
+                self.water_duration.get(guild_id, timedelta())
+            )
+            for guild_id in guild_ids
+        }
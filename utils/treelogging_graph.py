@@ -1,28 +1,102 @@
 # import built-in packages
+import asyncio
+import hashlib
+import threading
 from io import BytesIO
+from collections import OrderedDict
+from datetime import tzinfo
 # import 3rd party packages
-import pytz
 import pandas
-from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
+
+# the summary figure is built once and its axes are cleared between graphs
+# (a Figure is used instead of pyplot, so there is no global state shared between
+# threads, and it is drawn with the non-interactive Agg backend)
+# https://matplotlib.org/stable/users/explain/axes/arranging_axes.html#manual-adjustments-to-a-gridspec-layout
+SUMMARY_FIGURE = Figure(figsize=(16, 9), layout="constrained")
+SUMMARY_SPEC = SUMMARY_FIGURE.add_gridspec(nrows=2, ncols=2)
+SUMMARY_AXES = (
+    SUMMARY_FIGURE.add_subplot(SUMMARY_SPEC[0, 0]),
+    SUMMARY_FIGURE.add_subplot(SUMMARY_SPEC[0, 1]),
+    SUMMARY_FIGURE.add_subplot(SUMMARY_SPEC[1, :])
+)
+# only one thread can draw on the shared figure at a time
+SUMMARY_LOCK = threading.Lock()
+
+# the most recent graphs, keyed by the logs and settings they were drawn from,
+# so asking for the same graph again does not redraw it
+# (at most GRAPH_CACHE_SIZE graphs, and GRAPH_CACHE_MAX_BYTES of PNGs in total)
+GRAPH_CACHE_SIZE = 64
+GRAPH_CACHE_MAX_BYTES = 32 * 1024 * 1024
+GRAPH_CACHE: OrderedDict[tuple, bytes] = OrderedDict()
+GRAPH_CACHE_LOCK = threading.Lock()
+
+# shaded regions of different widths around the median (lower, upper, alpha)
+SHADED_REGIONS = (
+    (40, 60, 0.3),
+    (25, 75, 0.2),
+    (10, 90, 0.1),
+)
+PERCENTILES = sorted(
+    percentile / 100
+    for lower, upper, _ in SHADED_REGIONS
+    for percentile in (lower, upper)
+)
 
 async def util_graph_summary(
     df: pandas.DataFrame,
     max_duration: int,
-    output_timezone: pytz.timezone
+    output_timezone: tzinfo
 ) -> BytesIO:
     """
-    Docstring for util_graph_summary
+    Generates the summary graph in a worker thread,
+    so the event loop is not blocked while it is drawn
     
     :param df: Pandas dataframe containing the columns 'start' and 'end'
     :type df: pandas.DataFrame
     :param max_duration: The maximum non-outlier value (seconds)
     :type max_duration: int
     :param output_timezone: The timezone which the values will be converted to
-    :type output_timezone: pytz.timezone
+    :type output_timezone: tzinfo
+    :return: BytesIO containing a PNG image of the graph
+    :rtype: BytesIO
+    """
+    return await asyncio.to_thread(
+        graph_summary,
+        df, max_duration, output_timezone
+    )
+
+def graph_summary(
+    df: pandas.DataFrame,
+    max_duration: int,
+    output_timezone: tzinfo
+) -> BytesIO:
+    """
+    Docstring for graph_summary
+    
+    :param df: Pandas dataframe containing the columns 'start' and 'end'
+    :type df: pandas.DataFrame
+    :param max_duration: The maximum non-outlier value (seconds)
+    :type max_duration: int
+    :param output_timezone: The timezone which the values will be converted to
+    :type output_timezone: tzinfo
     :return: BytesIO containing a PNG image of the graph
     :rtype: BytesIO
     
     """
+    # return the cached graph if these logs have already been drawn
+    # (the window is relative to now, so the key is a digest of the rows in order)
+    row_hashes = pandas.util.hash_pandas_object(df, index=False).to_numpy()
+    key = (
+        len(df),
+        hashlib.blake2b(row_hashes.tobytes()).digest(),
+        max_duration, output_timezone
+    )
+    with GRAPH_CACHE_LOCK:
+        if key in GRAPH_CACHE:
+            GRAPH_CACHE.move_to_end(key)
+            return BytesIO(GRAPH_CACHE[key])
+
     # create a copy
     df = df.copy()
 
@@ -39,14 +113,17 @@ async def util_graph_summary(
     df = df[(df['downtime'] < max_duration) & (df['uptime'] < max_duration)]
 
     # convert timezone AFTER calculations
-    df[['start', 'end']] = df[['start', 'end']].apply(
-        lambda col: col.dt.tz_convert(output_timezone)
-    )
-
-    # create columns for hour/day
-    df['hour_of_day'] = df['end'].dt.hour
-    df['day_of_week'] = df['end'].dt.day_of_week
-    df['date']        = df['end'].dt.date
+    # (only 'end' is used for the hour/day columns)
+    # then take the local wall clock time as whole seconds since the epoch,
+    # which stays correct across daylight saving changes
+    local_end = df['end'].dt.tz_convert(output_timezone).dt.tz_localize(None)
+    seconds = local_end.to_numpy(dtype="datetime64[s]").view("i8")
+    days = seconds // (60 * 60 * 24)
+
+    # create columns for hour/day (1970-01-01 was a Thursday, and Monday is 0)
+    df['hour_of_day'] = (seconds // (60 * 60)) % 24
+    df['day_of_week'] = (days + 3) % 7
+    df['date']        = days.astype("datetime64[D]")
 
     # drop na from dataframe
     df = df.dropna()
@@ -60,26 +137,53 @@ async def util_graph_summary(
     daily_med  = daily_downtime.median()
     date_ratio   = df.groupby('date')['ratio'].mean()
 
-    # set figure size
-    # https://matplotlib.org/stable/users/explain/axes/arranging_axes.html#manual-adjustments-to-a-gridspec-layout
-    fig = plt.figure(figsize=(16, 9), layout="constrained")
-    spec = fig.add_gridspec(nrows=2, ncols=2)
+    # calculate every percentile for the shaded regions at once
+    # (columns are the percentiles, rows are the hour/day,
+    # reindexed so the columns still exist when every row was an outlier)
+    hourly_quantiles = hourly_downtime.quantile(PERCENTILES).unstack().reindex(columns=PERCENTILES)
+    daily_quantiles  = daily_downtime.quantile(PERCENTILES).unstack().reindex(columns=PERCENTILES)
+
+    with SUMMARY_LOCK:
+        # clear the previous graph
+        for ax in SUMMARY_AXES:
+            ax.clear()
+        buffer = draw_summary(
+            SUMMARY_FIGURE, *SUMMARY_AXES,
+            hourly_quantiles, daily_quantiles,
+            hourly_med, daily_med, date_ratio
+        )
+
+    # cache the graph, removing the least recently used
+    with GRAPH_CACHE_LOCK:
+        GRAPH_CACHE[key] = buffer.getvalue()
+        total_bytes = sum(len(png) for png in GRAPH_CACHE.values())
+        while len(GRAPH_CACHE) > GRAPH_CACHE_SIZE or total_bytes > GRAPH_CACHE_MAX_BYTES:
+            _, png = GRAPH_CACHE.popitem(last=False)
+            total_bytes -= len(png)
+    return buffer
 
+def draw_summary(
+    fig: Figure,
+    ax0, ax1, ax2,
+    hourly_quantiles: pandas.DataFrame,
+    daily_quantiles: pandas.DataFrame,
+    hourly_med: pandas.Series,
+    daily_med: pandas.Series,
+    date_ratio: pandas.Series
+) -> BytesIO:
+    """
+    Draws the summary onto the (cleared) figure and saves it as a PNG
+    """
     # plot hour_of_day
-    ax0 = fig.add_subplot(spec[0, 0])
     # main median line
     ax0.plot(
         hourly_med.index, hourly_med,
         '-', color='mediumseagreen', linewidth=2
     )
     # shaded region of different widths ig
-    for lower, upper, alpha in (
-        (40, 60, 0.3),
-        (25, 75, 0.2),
-        (10, 90, 0.1),
-    ):
-        hourly_lower = hourly_downtime.quantile(lower / 100)
-        hourly_upper = hourly_downtime.quantile(upper / 100)
+    for lower, upper, alpha in SHADED_REGIONS:
+        hourly_lower = hourly_quantiles[lower / 100]
+        hourly_upper = hourly_quantiles[upper / 100]
         ax0.fill_between(
             hourly_med.index, hourly_lower, hourly_upper,
             color='mediumseagreen', alpha=alpha,
@@ -96,20 +200,15 @@ async def util_graph_summary(
     ax0.legend(loc='upper center', ncol=3)
 
     # plot day_of_week
-    ax1 = fig.add_subplot(spec[0, 1])
     # main median line
     ax1.plot(
         daily_med.index, daily_med,
         '-', color='forestgreen', linewidth=2
     )
     # shaded region of different widths ig
-    for lower, upper, alpha in (
-        (40, 60, 0.3),
-        (25, 75, 0.2),
-        (10, 90, 0.1),
-    ):
-        daily_lower = daily_downtime.quantile(lower / 100)
-        daily_upper = daily_downtime.quantile(upper / 100)
+    for lower, upper, alpha in SHADED_REGIONS:
+        daily_lower = daily_quantiles[lower / 100]
+        daily_upper = daily_quantiles[upper / 100]
         ax1.fill_between(
             daily_med.index, daily_lower, daily_upper,
             color='forestgreen', alpha=alpha,
@@ -126,7 +225,6 @@ async def util_graph_summary(
     ax1.legend(loc='upper center', ncol=3)
 
     # plot downtime by date - line chart with error bars
-    ax2 = fig.add_subplot(spec[1, :])
     ax2.bar(
         date_ratio.index, date_ratio,
         color='darkolivegreen',
@@ -143,8 +241,7 @@ async def util_graph_summary(
 
     # save to a BytesIO buffer
     buffer = BytesIO()
-    plt.savefig(buffer, format="png")
-    plt.close()
+    fig.savefig(buffer, format="png")
     # return the buffer
     buffer.seek(0)
     return buffer
@@ -1,54 +1,61 @@
 # import 3rd party modules
 import discord
 
+# the bit used for each known button emoji
+EMOJI_BITS = {
+    "bugnet": 1,
+    "💧": 2,
+    "🧺": 4,
+    "🔄": 8
+}
 
-async def button_emojis_from_message(message: discord.Message) -> set[str]:
+# the component classes of buttons and action rows
+BUTTON_TYPES = (discord.Button, discord.components.Button)
+ACTION_ROW_TYPES = (discord.ActionRow, discord.components.ActionRow)
+
+def walk_buttons(components):
+    """
+    Yields every button, both on its own and inside action rows
+    """
+    for component in components:
+        if isinstance(component, ACTION_ROW_TYPES):
+            yield from component.children
+        else:
+            yield component
+
+def get_emoji(component) -> str | None:
     """
-    Gets the emojis of all the buttons
+    Gets the name of an enabled button's emoji
     """
-    # helper function
-    def get_emoji(component):
-        if (
-            # doesn't exist?
-            component is None or
-            # not a button
-            component.type.name != "button" or
-            # button is disabled
-            component.disabled
-        ):
-            # return nothing
-            return None
-        # get the emoji as a string
-        emoji = component.emoji
-        if emoji is None: # doesn't exist
-            return None
-        elif isinstance(emoji, (discord.PartialEmoji, discord.Emoji)):
-            emoji = emoji.name
-        elif isinstance(emoji, str):
-            pass
-        else: # unknown type
-            return None
+    if (
+        # not a button
+        not isinstance(component, BUTTON_TYPES) or
+        component.type is not discord.ComponentType.button or
+        # button is disabled
+        component.disabled
+    ):
+        return None
+    # get the emoji as a string
+    emoji = component.emoji
+    if isinstance(emoji, (discord.PartialEmoji, discord.Emoji)):
+        return emoji.name
+    if isinstance(emoji, str):
         return emoji
+    # doesn't exist or unknown type
+    return None
 
-    # create a set (unique values only)
-    buttons = set()
+async def button_emojis_from_message(message: discord.Message) -> int:
+    """
+    Gets the emojis of all the buttons,
+    as a bitmask of the known emojis in EMOJI_BITS
+    """
+    # start with no buttons
+    buttons = 0
     # check if components exist
     components = message.components
     if components is None:
-        return None
-    # interate through list of components
-    for component in components:
-        # button - single button
-        if isinstance(component, (discord.Button, discord.components.Button)):
-            emoji = get_emoji(component=message.button)
-            if emoji is not None:
-                buttons.add(emoji)
-        # action row - multiple buttons
-        elif isinstance(component, (discord.ActionRow, discord.components.ActionRow)):
-            for child in component.children:
-                if isinstance(child, (discord.Button, discord.components.Button)):
-                    emoji = get_emoji(component=child)
-                    if emoji is not None:
-                        buttons.add(emoji)
-
+        return buttons
+    # combine the bit of every known emoji
+    for component in walk_buttons(components):
+        buttons |= EMOJI_BITS.get(get_emoji(component), 0)
     return buttons